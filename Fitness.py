@@ -1,30 +1,42 @@
 import datetime
+import os
 import sqlite3
-import matplotlib.pyplot as plt
-import seaborn as sns
-import pprint
-
-# Connect to the SQLite database
-# Connect to the SQLite database
-conn = sqlite3.connect('fitness_tracker.db')
-cursor = conn.cursor()
-
-# Create goals table with ISO 8601 date format
-cursor.execute('''CREATE TABLE IF NOT EXISTS goals (
-                id INTEGER PRIMARY KEY,
-                description TEXT,
-                target INTEGER,
-                deadline TEXT,
-                progress INTEGER,
-                username TEXT
-                )''')
-
-# Initial users dictionary
-users = {
-    'Bhushan61': 'Bhushan@61',
-    'Pranav18': 'Pranav@18',
-    'bh': '22'
-}
+import sys
+import body_metrics
+import diet_catalog
+import metrics
+from progress_journal import BATCHED, ProgressJournal
+
+# Plotting libraries, NumPy and the database are only loaded when first needed,
+# so importing this module or showing the menu has no side effects.
+DB_PATH = os.environ.get("FITNESS_DB", 'fitness_tracker.db')
+
+_conn = None
+_progress_journal = None
+
+# Connect to the SQLite database and create the tables on first use
+def get_connection():
+    global _conn, _progress_journal
+    if _conn is None:
+        import repository
+
+        # Create the goals table, the daily calorie log and its summaries.
+        # A database from before accounts were stored keeps its old logins;
+        # add accounts to a new one with "python auth.py add-user NAME".
+        import auth
+        conn = sqlite3.connect(DB_PATH)
+        auth.migrate_legacy_users(conn)
+        repository.create_schema(conn)
+
+        # Progress updates are written through a write-behind journal.
+        # Set FITNESS_DURABILITY to "sync", "batched" or "wal" to choose how.
+        _progress_journal = ProgressJournal(conn, mode=os.environ.get("FITNESS_DURABILITY", BATCHED))
+        _conn = conn
+    return _conn
+
+def get_progress_journal():
+    get_connection()
+    return _progress_journal
 
 # Function to handle user login
 def login():
@@ -32,8 +44,9 @@ def login():
     username = input("Enter your username: ")
     password = input("Enter your password: ")
     
-    # Verify username and password
-    if username in users and users[username] == password:
+    # Verify username and password against the salted hashes in the users table
+    import auth
+    if auth.verify_user(get_connection(), username, password):
         print("Login successful!\n")
         return username
     else:
@@ -48,9 +61,12 @@ class Goal:
         self.deadline = deadline
         self.progress = 0
         self.username = username
+        # Progress added since the goal was last written to the database
+        self.unsaved = 0
 
     def update_progress(self, amount):
         self.progress += amount
+        self.unsaved += amount
 
     def is_complete(self):
         return self.progress >= self.target
@@ -58,17 +74,32 @@ class Goal:
     def days_remaining(self):
         return (self.deadline - datetime.date.today()).days
 
+    @metrics.timed("db.save_goal")
     def save_to_database(self):
+        conn = get_connection()
         # Serialize deadline to ISO 8601 format
         iso_deadline = self.deadline.isoformat()
-        cursor.execute("INSERT INTO goals (description, target, deadline, progress, username) VALUES (?, ?, ?, ?, ?)",
-                       (self.description, self.target, iso_deadline, self.progress, self.username))
-        conn.commit()
+        with metrics.timer("db.insert_goal"):
+            cursor = conn.execute("INSERT INTO goals (description, target, deadline, progress, username) VALUES (?, ?, ?, ?, ?)",
+                           (self.description, self.target, iso_deadline, self.progress, self.username))
+        with metrics.timer("db.commit"):
+            conn.commit()
         self.id = cursor.lastrowid
+        self.unsaved = 0
 
+    @metrics.timed("db.update_progress")
     def update_progress_in_db(self):
-        cursor.execute("UPDATE goals SET progress = ? WHERE id = ?", (self.progress, self.id))
-        conn.commit()
+        # Recorded as a progress event; goals.progress follows when the journal is flushed
+        if self.unsaved:
+            get_progress_journal().record(self.id, self.unsaved)
+            self.unsaved = 0
+
+    @staticmethod
+    def flush():
+        # Write any progress updates still held in the journal
+        if _progress_journal is None:
+            return 0
+        return _progress_journal.flush()
    
 # Define the ProgressTracker class for updating and displaying progress
 class ProgressTracker:
@@ -87,7 +118,15 @@ class ProgressTracker:
 # Define the Visualization class for generating a pie chart of goal progress
 class Visualization:
     @staticmethod
-    def generate_pie_chart(goal):
+    @metrics.timed("charts.pie_chart")
+    def generate_pie_chart(goal, path=None):
+        # Headless mode: render with Agg and write the image to a file
+        if path is not None:
+            import charts
+            image = charts.get_renderer().pie_chart(goal.progress, goal.target, fmt=charts.format_for(path))
+            charts.save(image, path)
+            return image
+
         # Calculate progress made and remaining progress
         progress_made = goal.progress
         remaining_progress = goal.target - progress_made
@@ -98,9 +137,11 @@ class Visualization:
         colors = ['green', 'red']
 
         # Create the pie chart
-        plt.figure(figsize=(6, 6))
-        plt.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%')
-        plt.title('Goal Progress')
+        with metrics.timer("charts.pie_figure"):
+            import matplotlib.pyplot as plt
+            plt.figure(figsize=(6, 6))
+            plt.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%')
+            plt.title('Goal Progress')
         plt.show()
 
 # Function to calculate BMI and collect user data
@@ -114,21 +155,9 @@ def calculate_bmi():
         print("Invalid input. Please enter numeric values for age, weight, and height.")
         return None
     
-    # Convert height from cm to meters
-    height_meter = height_cm / 100
-    
-    # Calculate BMI
-    bmi = weight / (height_meter ** 2)
-    
-    # Determine BMI category
-    if bmi < 18.5:
-        category = "Underweight"
-    elif 18.5 <= bmi < 25:
-        category = "Normal weight"
-    elif 25 <= bmi < 30:
-        category = "Overweight"
-    else:
-        category = "Obese"
+    # Calculate BMI and determine its category
+    bmi = body_metrics.compute_bmi(weight, height_cm)
+    category = body_metrics.bmi_category(bmi)
     
     # Display the result
     print(f"\nName: {name}")
@@ -142,12 +171,18 @@ def calculate_bmi():
     return name, age, weight, height_cm, bmi
 
 # Function to collect daily data for calorie intake and expenditure
-def collect_daily_data():
+# Each entry is also saved to the user's daily log; re-entering a date replaces it.
+def collect_daily_data(username):
     daily_data = []
     
     print("\n** Enter daily data **\n")
     while True:
         date = input("Enter the date (YYYY-MM-DD): ")
+        try:
+            datetime.date.fromisoformat(date)
+        except ValueError:
+            print("Invalid date. Please use the YYYY-MM-DD format.")
+            continue
         try:
             calorie_intake = float(input("Enter daily calorie intake: "))
             calorie_expenditure = float(input("Enter daily calorie expenditure: "))
@@ -155,6 +190,9 @@ def collect_daily_data():
             print("Invalid input. Please enter numeric values for calorie intake and expenditure.")
             continue
         
+        import daily_log
+        with metrics.timer("db.upsert_day"):
+            daily_log.upsert_day(get_connection(), username, date, calorie_intake, calorie_expenditure)
         daily_data.append((date, calorie_intake, calorie_expenditure))
         
         more_data = input("Do you want to enter more data? (yes/no): ").lower()
@@ -164,56 +202,34 @@ def collect_daily_data():
     return daily_data
 
 # Function to plot the graph of daily calorie intake vs. expenditure
-def plot_calorie_graph(daily_data):
+# With a path the chart is rendered headless and written to that file instead.
+# mode is "bar" or "line"; long ranges are drawn at a lower level of detail
+# (weekly or monthly bars, downsampled lines), see charts.draw_calorie.
+# summary is (conn, username, start, end) when daily_data is that user's log
+# for the range; rendered charts then read weekly and monthly bars from the
+# summary tables.
+@metrics.timed("charts.calorie_graph")
+def plot_calorie_graph(daily_data, path=None, mode="bar", summary=None):
+    import charts
+    dates, intake, expenditure = zip(*daily_data) if daily_data else ((), (), ())
+    if path is not None:
+        image = charts.get_renderer().calorie_chart(dates, intake, expenditure, fmt=charts.format_for(path), mode=mode,
+                                                    summary=summary)
+        charts.save(image, path)
+        return image
+
+    # Time figure construction separately from the blocking plt.show()
+    started = metrics.start()
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     # Use Seaborn style for the graph
     sns.set(style="whitegrid")
 
-    # Extract dates, calorie intake, and calorie expenditure from daily data
-    dates = [data[0] for data in daily_data]
-    calorie_intake = [data[1] for data in daily_data]
-    calorie_expenditure = [data[2] for data in daily_data]
-
-    # Create a figure and axis
-    plt.figure(figsize=(12, 8))
-
-    # Define bar width
-    bar_width = 0.35
-
-    # Plotting calorie intake and expenditure as side-by-side bars
-    x = range(len(dates))
-    intake_bars = plt.bar(x, calorie_intake, width=bar_width, label='Calorie Intake', color='#4caf50', alpha=0.8)
-    expenditure_bars = plt.bar([i + bar_width for i in x], calorie_expenditure, width=bar_width, label='Calorie Expenditure', color='#ff5722', alpha=0.8)
-
-    # Customize the x-tick labels to be centered between the two sets of bars
-    plt.xticks([i + bar_width / 2 for i in x], dates)
-
-    # Add gridlines for readability
-    plt.grid(True, linestyle='--', alpha=0.7)
-
-    # Customize labels and title
-    plt.xlabel('Date', fontsize=12)
-    plt.ylabel('Calories', fontsize=12)
-    plt.title('Calorie Intake vs. Expenditure', fontsize=16)
-
-    # Add a legend to differentiate between calorie intake and expenditure
-    plt.legend(loc='best', fontsize=10)
-
-    # Add data labels above the bars
-    def add_labels(bars):
-        for bar in bars:
-            height = bar.get_height()
-            plt.annotate(
-                f'{height:.0f}',  # Format the label
-                xy=(bar.get_x() + bar.get_width() / 2, height),
-                xytext=(0, 5),  # Add some space above the bar
-                textcoords="offset points",
-                ha='center',
-                fontsize=10
-            )
-
-    # Add data labels for both intake and expenditure bars
-    add_labels(intake_bars)
-    add_labels(expenditure_bars)
+    # Create a figure and draw intake and expenditure side by side
+    plt.figure(figsize=charts.CALORIE_SIZE)
+    charts.draw_calorie(plt.gca(), dates, intake, expenditure, mode)
+    metrics.stop("charts.calorie_figure", started)
 
     # Display the graph
     plt.show()
@@ -228,260 +244,38 @@ def suggest_diet_plan():
     
     choice = input("Enter your choice: ")
 
-    if choice == "1":
-        print("\n** 7-Day Diet Plan for Weight Gain **\n")
-        diet_plan = {
-     "Day 1": {
-        "Breakfast": "3 scrambled eggs with cheese and whole-grain bread (Approx. 500 calories) \n",
-        "Mid_morning_snack": "Greek yogurt with honey and mixed nuts (Approx. 250 calories) ",
-        "Lunch": "Chicken curry with rice, and a side of vegetables (Approx. 700 calories) \n",
-        "Afternoon_snack": "Protein shake with banana and peanut butter (Approx. 300 calories)",
-        "Dinner": "Beef stir-fry with rice and vegetables (Approx. 800 calories)",
-        "Workout": "45 minutes of weightlifting"
-    },
-    "Day 2": {
-        "breakfast": "Whole-grain pancakes with fruit and honey (Approx. 500 calories)",
-        "mid_morning_snack": "Glass of milk with banana (Approx. 200 calories)",
-        "lunch": "Grilled salmon with sweet potatoes and steamed veggies (Approx. 700 calories)",
-        "afternoon_snack": "Handful of almonds (Approx. 200 calories)",
-        "dinner": "Pasta with chicken and vegetables (Approx. 800 calories)",
-        "workout": "45 minutes of HIIT"
-    },
-    "Day 3": {
-        "breakfast": "Oatmeal with milk and fruit (Approx. 400 calories)",
-        "mid_morning_snack": "Peanut butter toast (Approx. 300 calories)",
-        "lunch": "Beef burger with whole-grain bun and sweet potato fries (Approx. 800 calories)",
-        "afternoon_snack": "Greek yogurt with honey and berries (Approx. 200 calories)",
-        "dinner": "Chicken curry with rice and mixed veggies (Approx. 800 calories)",
-        "workout": "45 minutes of strength training"
-    },
-    "Day 4": {
-        "breakfast": "Smoothie with milk, banana, and protein powder (Approx. 400 calories)",
-        "mid_morning_snack": "Handful of trail mix (Approx. 300 calories)",
-        "lunch": "Lentil soup with rice and vegetables (Approx. 700 calories)",
-        "afternoon_snack": "Cheese and whole-grain crackers (Approx. 200 calories)",
-        "dinner": "Grilled chicken with rice and mixed vegetables (Approx. 800 calories)",
-        "workout": "45 minutes of swimming"
-    },
-    "Day 5": {
-        "breakfast": "Omelette with cheese and vegetables, and whole-grain toast (Approx. 400 calories)",
-        "mid_morning_snack": "Protein shake with fruit (Approx. 300 calories)",
-        "lunch": "Grilled steak with mashed potatoes and veggies (Approx. 800 calories)",
-        "afternoon_snack": "Fruit and nut bar (Approx. 200 calories)",
-        "dinner": "Pasta with chicken, vegetables, and tomato sauce (Approx. 800 calories)",
-        "workout": "45 minutes of HIIT"
-    },
-    "Day 6": {
-        "breakfast": "French toast with syrup and fruit (Approx. 400 calories)",
-        "mid_morning_snack": "Greek yogurt with honey and mixed nuts (Approx. 300 calories)",
-        "lunch": "Beef stew with potatoes and vegetables (Approx. 800 calories)",
-        "afternoon_snack": "Handful of almonds (Approx. 200 calories)",
-        "dinner": "Shrimp stir-fry with rice and vegetables (Approx. 800 calories)",
-        "workout": "45 minutes of cycling"
-    },
-    "Day 7": {
-        "breakfast": "Whole-grain waffles with fruit and syrup (Approx. 500 calories)",
-        "mid_morning_snack": "Protein bar (Approx. 250 calories)",
-        "lunch": "Chicken fajitas with tortillas and vegetables (Approx. 800 calories)",
-        "afternoon_snack": "Handful of trail mix (Approx. 300 calories)",
-        "dinner": "Turkey and rice casserole with vegetables (Approx. 800 calories)",
-        "workout": "45 minutes of strength training"
-    }
-}
-    elif choice == "2":
-        print("\n** 7-Day Diet Plan for Weight Loss **\n")
-        diet_plan = {
-         "Day 1": {
-        "breakfast": "1 bowl of oatmeal with berries and almond milk (Approx. 300 calories)",
-        "mid_morning_snack": "1 apple (Approx. 70 calories)",
-        "lunch": "Grilled chicken salad with greens, tomatoes, and vinaigrette dressing (Approx. 400 calories)",
-        "afternoon_snack": "Carrot sticks and hummus (Approx. 100 calories)",
-        "dinner": "Grilled fish with steamed vegetables (Approx. 400 calories)",
-        "workout": "45 minutes of brisk walking"
-    },
-    "Day 2": {
-        "breakfast": "1 smoothie with spinach, banana, and protein powder (Approx. 300 calories)",
-        "mid_morning_snack": "1 orange (Approx. 60 calories)",
-        "lunch": "1 bowl of quinoa with black beans and vegetables (Approx. 400 calories)",
-        "afternoon_snack": "Greek yogurt with berries (Approx. 150 calories)",
-        "dinner": "Turkey stir-fry with vegetables (Approx. 400 calories)",
-        "workout": "45 minutes of yoga"
-    },
-    "Day 3": {
-        "breakfast": "2 boiled eggs with whole-grain toast (Approx. 300 calories)",
-        "mid_morning_snack": "Handful of almonds (Approx. 100 calories)",
-        "lunch": "Grilled shrimp with a mixed salad (Approx. 400 calories)",
-        "afternoon_snack": "1 pear (Approx. 70 calories)",
-        "dinner": "Chicken vegetable soup (Approx. 350 calories)",
-        "workout": "45 minutes of cycling"
-    },
-    "Day 4": {
-        "breakfast": "1 bowl of mixed fruit salad with yogurt (Approx. 250 calories)",
-        "mid_morning_snack": "1 banana (Approx. 100 calories)",
-        "lunch": "1 bowl of lentil soup with a side salad (Approx. 350 calories)",
-        "afternoon_snack": "1 glass of green smoothie (Approx. 150 calories)",
-        "dinner": "Grilled salmon with steamed vegetables (Approx. 400 calories)",
-           "workout": "30 minutes of jogging"
-    },
-    "Day 5": {
-        "breakfast": "2 boiled eggs with whole-grain toast and sliced tomato (Approx. 300 calories)",
-        "mid_morning_snack": "1 glass of buttermilk (Approx. 60 calories)",
-        "lunch": "1 bowl of chicken and vegetable stir-fry (Approx. 400 calories)",
-        "afternoon_snack": "Celery sticks with peanut butter (Approx. 120 calories)",
-        "dinner": "Grilled fish with asparagus (Approx. 400 calories)",
-        "workout": "45 minutes of yoga"
-    },
-    "Day 6": {
-        "breakfast": "1 smoothie with spinach, banana, and protein powder (Approx. 300 calories)",
-        "mid_morning_snack": "1 apple (Approx. 70 calories)",
-        "lunch": "Grilled chicken salad with mixed greens and vinaigrette (Approx. 400 calories)",
-        "afternoon_snack": "Greek yogurt with honey (Approx. 120 calories)",
-        "dinner": "Lentil soup with a side salad (Approx. 350 calories)",
-        "workout": "45 minutes of brisk walking"
-    },
-    "Day 7": {
-        "breakfast": "1 bowl of oats with berries and almond milk (Approx. 300 calories)",
-        "mid_morning_snack": "Carrot sticks and hummus (Approx. 100 calories)",
-        "lunch": "Grilled chicken wrap with whole-grain tortilla and vegetables (Approx. 400 calories)",
-        "afternoon_snack": "Handful of almonds (Approx. 100 calories)",
-        "dinner": "Shrimp stir-fry with steamed vegetables (Approx. 400 calories)",
-        "workout": "30 minutes of dancing"
-    }
-}
-    elif choice == "3":
-        print("\n** 7-Day Diet Plan for Maintenance **\n")
-        diet_plan = {
-         "Day 1": {
-        "breakfast": "1 bowl of oatmeal with milk and berries (Approx. 300 calories)",
-        "mid_morning_snack": "Greek yogurt with honey (Approx. 150 calories)",
-        "lunch": "Grilled chicken with whole-grain rice and vegetables (Approx. 550 calories)",
-        "afternoon_snack": "1 apple (Approx. 70 calories)",
-        "dinner": "Salmon with quinoa and vegetables (Approx. 500 calories)",
-        "workout": "30 minutes of moderate-intensity exercise (e.g., walking, cycling)"
-    },
-    "Day 2": {
-        "breakfast": "1 bowl of whole-grain cereal with milk and fruit (Approx. 300 calories)",
-        "mid_morning_snack": "Handful of mixed nuts (Approx. 150 calories)",
-        "lunch": "Turkey salad with mixed greens and vinaigrette dressing (Approx. 500 calories)",
-        "afternoon_snack": "Greek yogurt with berries (Approx. 150 calories)",
-        "dinner": "Chicken stir-fry with vegetables and brown rice (Approx. 500 calories)",
-        "workout": "30 minutes of yoga"
-    },
-    "Day 3": {
-        "breakfast": "Whole-grain toast with scrambled eggs and vegetables (Approx. 350 calories)",
-        "mid_morning_snack": "1 pear (Approx. 70 calories)",
-        "lunch": "Grilled fish with sweet potatoes and steamed veggies (Approx. 550 calories)",
-        "afternoon_snack": "1 orange (Approx. 60 calories)",
-        "dinner": "Chicken salad wrap with whole-grain tortilla and vegetables (Approx. 500 calories)",
-        "workout": "30 minutes of brisk walking"
-    },
-    "Day 4": {
-        "breakfast": "Smoothie with banana, spinach, and protein powder (Approx. 300 calories)",
-        "mid_morning_snack": "1 orange (Approx. 60 calories)",
-        "lunch": "Lentil soup with a side salad (Approx. 450 calories)",
-        "afternoon_snack": "1 banana (Approx. 100 calories)",
-        "dinner": "Grilled fish with steamed vegetables (Approx. 500 calories)",
-        "workout": "30 minutes of swimming"
-    },
-    "Day 5": {
-        "breakfast": "French toast with berries (Approx. 300 calories)",
-        "mid_morning_snack": "Greek yogurt with honey and nuts (Approx. 200 calories)",
-        "lunch": "Grilled steak with whole-grain rice and vegetables (Approx. 600 calories)",
-        "afternoon_snack": "1 pear (Approx. 70 calories)",
-        "dinner": "Pasta with chicken, vegetables, and tomato sauce (Approx. 500 calories)",
-        "workout": "30 minutes of dancing"
-    },
-    "Day 6": {
-        "breakfast": "Whole-grain pancakes with fruit and honey (Approx. 350 calories)",
-        "mid_morning_snack": "Greek yogurt with berries (Approx. 150 calories)",
-        "lunch": "Chicken salad wrap with whole-grain tortilla and vegetables (Approx. 500 calories)",
-        "afternoon_snack": "Handful of mixed nuts (Approx. 150 calories)",
-        "dinner": "Shrimp stir-fry with vegetables and quinoa (Approx. 500 calories)",
-        "workout": "30 minutes of cycling"
-    },
-    "Day 7": {
-        "breakfast": "1 bowl of oatmeal with almond milk and berries (Approx. 300 calories)",
-        "mid_morning_snack": "1 apple (Approx. 70 calories)",
-        "lunch": "Turkey salad with mixed greens and vinaigrette (Approx. 500 calories)",
-        "afternoon_snack": "Carrot sticks and hummus (Approx. 100 calories)",
-        "dinner": "Grilled chicken with rice and mixed vegetables (Approx. 500 calories)",
-        "workout": "30 minutes of moderate-intensity exercise"
-    }
-}
-    elif choice == "4":
-        print("\n** 7-Day Diet Plan for Muscle Gain **\n")
-        diet_plan = {
-         "Day 1": {
-        "breakfast": "4 scrambled eggs with cheese and whole-grain toast (Approx. 500 calories)",
-        "mid_morning_snack": "Protein shake with fruit and peanut butter (Approx. 300 calories)",
-        "lunch": "Grilled chicken breast with sweet potato and steamed veggies (Approx. 700 calories)",
-        "afternoon_snack": "Greek yogurt with honey and berries (Approx. 250 calories)",
-        "dinner": "Beef stir-fry with rice and mixed vegetables (Approx. 800 calories)",
-        "workout": "1 hour of weightlifting"
-    },
-    "Day 2": {
-        "breakfast": "Whole-grain pancakes with fruit and honey (Approx. 500 calories)",
-        "mid_morning_snack": "Protein shake with banana and peanut butter (Approx. 300 calories)",
-        "lunch": "Grilled salmon with sweet potatoes and steamed veggies (Approx. 700 calories)",
-        "afternoon_snack": "Handful of almonds (Approx. 250 calories)",
-        "dinner": "Pasta with chicken and vegetables (Approx. 800 calories)",
-        "workout": "1 hour of strength training"
-    },
-    "Day 3": {
-        "breakfast": "Oatmeal with milk and fruit (Approx. 400 calories)",
-        "mid_morning_snack": "Greek yogurt with honey and mixed nuts (Approx. 300 calories)",
-        "lunch": "Beef burger with whole-grain bun and sweet potato fries (Approx. 800 calories)",
-        "afternoon_snack": "Handful of trail mix (Approx. 250 calories)",
-        "dinner": "Chicken curry with rice and mixed veggies (Approx. 800 calories)",
-        "workout": "1 hour of HIIT"
-    },
-    "Day 4": {
-        "breakfast": "Smoothie with milk, banana, and protein powder (Approx. 400 calories)",
-        "mid_morning_snack": "Peanut butter on whole-grain bread (Approx. 300 calories)",
-        "lunch": "Lentil soup with rice and vegetables (Approx. 700 calories)",
-        "afternoon_snack": "Cheese and whole-grain crackers (Approx. 250 calories)",
-        "dinner": "Grilled chicken with rice and mixed vegetables (Approx. 800 calories)",
-        "workout": "1 hour of weightlifting"
-    },
-    "Day 5": {
-        "breakfast": "Omelette with cheese and vegetables and whole-grain toast (Approx. 400 calories)",
-        "mid_morning_snack": "Protein shake with fruit and peanut butter (Approx. 300 calories)",
-        "lunch": "Grilled steak with mashed potatoes and veggies (Approx. 800 calories)",
-        "afternoon_snack": "Handful of mixed nuts (Approx. 250 calories)",
-        "dinner": "Pasta with chicken, vegetables, and tomato sauce (Approx. 800 calories)",
-        "workout": "1 hour of strength training"
-    },
-    "Day 6": {
-        "breakfast": "French toast with syrup and fruit (Approx. 400 calories)",
-        "mid_morning_snack": "Greek yogurt with honey and mixed nuts (Approx. 300 calories)",
-        "lunch": "Beef stew with potatoes and vegetables (Approx. 800 calories)",
-        "afternoon_snack": "Greek yogurt with honey and berries (Approx. 250 calories)",
-        "dinner": "Shrimp stir-fry with rice and vegetables (Approx. 800 calories)",
-        "workout": "1 hour of HIIT"
-    },
-    "Day 7": {
-        "breakfast": "Whole-grain waffles with fruit and syrup (Approx. 500 calories)",
-        "mid_morning_snack": "Protein bar (Approx. 250 calories)",
-        "lunch": "Chicken fajitas with tortillas and vegetables (Approx. 800 calories)",
-        "afternoon_snack": "Peanut butter on whole-grain bread (Approx. 300 calories)",
-        "dinner": "Turkey and rice casserole with vegetables (Approx. 800 calories)",
-        "workout": "1 hour of weightlifting"
-}
-}
-
-    else:
+    # Plans come from the diet catalog, which is loaded and indexed once
+    goal = diet_catalog.GOAL_CHOICES.get(choice)
+    if goal is None:
         print("Invalid choice. Please try again.")
         return
-    
-    # Print the diet plan with proper formatting
-    for day, plan in diet_plan.items():
-       print(f"{day}:")
-       for meal, description in plan.items():
-          print(f"    {meal.capitalize()}:")
-          print(f"        {description}")
-       print("")  # Add a blank line after each day
 
+    catalog = diet_catalog.load_catalog()
+
+    # Optionally build a plan around the user's own calorie target
+    personalise = input("Build the plan around your calorie target? (yes/no): ").lower()
+    if personalise == 'yes':
+        user_data = calculate_bmi()
+        if user_data is None:
+            return
+        name, age, weight, height_cm, bmi = user_data
+
+        import meal_planner
+        target = meal_planner.calorie_target(weight, height_cm, age, goal)
+        with metrics.timer("plans.generate"):
+            plan = meal_planner.MealPlanner(catalog).plan_week(target)
+        print("\n** 7-Day Diet Plan for {} ({} calories a day) **\n".format(catalog.titles[goal], target))
+        if not plan.within_tolerance:
+            print("Note: the closest the available meals can get is {} calories a day.\n".format(plan.totals[0]))
+        with metrics.timer("plans.write"):
+            sys.stdout.write(meal_planner.render_week(plan, goal, catalog))
+        return
+
+    print("\n** 7-Day Diet Plan for {} **\n".format(catalog.titles[goal]))
 
+    # Write the preformatted plan in one go
+    with metrics.timer("plans.write"):
+        sys.stdout.write(catalog.render(goal))
 
 # Function to set and track goals for the user
 def set_and_track_goals(username):
@@ -530,7 +324,9 @@ def set_and_track_goals(username):
             print("Time's up! You didn't achieve your goal. Keep pushing!")
     except Exception as e:
         print(f"An error occurred while setting and tracking goals: {e}")
-pprint.pprint(suggest_diet_plan, width=120)
+    finally:
+        # Write buffered progress now, so other readers see it without waiting for the next update or exit
+        Goal.flush()
         
 
 # Main function to display the menu and handle user choices
@@ -554,7 +350,7 @@ def main():
             elif choice == "2":
                 suggest_diet_plan()
             elif choice == "3":
-                daily_data = collect_daily_data()
+                daily_data = collect_daily_data(username)
                 plot_calorie_graph(daily_data)
            
             elif choice == "4":
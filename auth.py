@@ -0,0 +1,192 @@
+import base64
+import collections
+import concurrent.futures
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+
+import metrics
+
+# Password hashing cost. scrypt's n can be raised (powers of two) as hardware
+# gets faster; stored hashes record their own parameters, so old ones still verify.
+SCRYPT_N = int(os.environ.get("FITNESS_SCRYPT_N", 2 ** 14))
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERATIONS = 600000
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+CREATE_SQL = '''CREATE TABLE IF NOT EXISTS users (
+                username TEXT PRIMARY KEY,
+                password_hash TEXT NOT NULL
+                )'''
+
+INSERT_SQL = "INSERT INTO users (username, password_hash) VALUES (?, ?)"
+SELECT_HASH_SQL = "SELECT password_hash FROM users WHERE username = ?"
+
+# Accounts that used to be hard-coded in Fitness.py, with their passwords
+# hashed. Only migrate_legacy_users() adds them, and only to a database the
+# old Fitness.py created; new databases start with no accounts.
+LEGACY_USERS = {
+    "Bhushan61": "scrypt$16384$8$1$oWoLHqLa6ZLSI6uq2d3dUw==$Xl39ipBExECOyOjeACeKDTmoca+FvmX04dfcKOWAz20=",
+    "Pranav18": "scrypt$16384$8$1$0I4CpiN4CpaLBWEpcNLW2w==$KwEf9X5UgWe0sU6DDMhj2OUh5vCbV4WT/V9ujMbxmOY=",
+    "bh": "scrypt$16384$8$1$DKaFOF01I0yX5/qvTkpAGw==$8D+TB7nRbxzFx81Ydg6OgLKi4qRAIaj7YTbrTScQTug=",
+}
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+# Hash a password with a random salt; the result records method and cost
+def hash_password(password, method="scrypt"):
+    salt = os.urandom(SALT_BYTES)
+    if method == "scrypt":
+        key = hashlib.scrypt(password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=KEY_BYTES)
+        return "scrypt${}${}${}${}${}".format(SCRYPT_N, SCRYPT_R, SCRYPT_P, _b64(salt), _b64(key))
+    if method == "pbkdf2_sha256":
+        key = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, PBKDF2_ITERATIONS, KEY_BYTES)
+        return "pbkdf2_sha256${}${}${}".format(PBKDF2_ITERATIONS, _b64(salt), _b64(key))
+    raise ValueError("Unknown password hashing method: {}".format(method))
+
+
+def verify_password(password, stored):
+    method, *fields = stored.split("$")
+    if method == "scrypt":
+        n, r, p, salt, expected = fields
+        expected = base64.b64decode(expected)
+        key = hashlib.scrypt(password.encode(), salt=base64.b64decode(salt), n=int(n), r=int(r), p=int(p),
+                             dklen=len(expected), maxmem=256 * int(n) * int(r) + (1 << 20))
+    elif method == "pbkdf2_sha256":
+        iterations, salt, expected = fields
+        expected = base64.b64decode(expected)
+        key = hashlib.pbkdf2_hmac("sha256", password.encode(), base64.b64decode(salt), int(iterations), len(expected))
+    else:
+        return False
+    return hmac.compare_digest(key, expected)
+
+
+def create_table(conn):
+    conn.execute(CREATE_SQL)
+    conn.commit()
+
+
+def _table_exists(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+
+# One-time migration for a database from before the users table (it has goals
+# but no users): create the table with the legacy accounts, so their logins
+# keep working. Does nothing for any other database; returns True if it ran.
+def migrate_legacy_users(conn):
+    if _table_exists(conn, "users") or not _table_exists(conn, "goals"):
+        return False
+    with conn:
+        conn.execute(CREATE_SQL)
+        conn.executemany(INSERT_SQL, LEGACY_USERS.items())
+    return True
+
+
+def add_user(conn, username, password):
+    with conn:
+        conn.execute(INSERT_SQL, (username, hash_password(password)))
+
+
+@metrics.timed("db.verify_user")
+def verify_user(conn, username, password):
+    row = conn.execute(SELECT_HASH_SQL, (username,)).fetchone()
+    return row is not None and verify_password(password, row[0])
+
+
+# Credential checks for the concurrent (threaded or asyncio) paths.
+# Hashing runs in a thread pool so callers never block on it, and a bounded
+# LRU of session tokens lets repeat requests skip the hash entirely.
+class CredentialStore:
+    def __init__(self, db, workers=4, max_sessions=10000, session_ttl=3600):
+        self.db = db
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="auth")
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self.sessions = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    # Hash in the pool and store the new user; the Future completes once it is written
+    def register(self, username, password):
+        return self.executor.submit(self._register, username, password)
+
+    @metrics.timed("auth.register")
+    def _register(self, username, password):
+        return self.db.execute(INSERT_SQL, (username, hash_password(password))).result()
+
+    @metrics.timed("auth.login")
+    def _login(self, username, password):
+        row = self.db.read_one(SELECT_HASH_SQL, (username,))
+        if row is None or not verify_password(password, row[0]):
+            return None
+        token = secrets.token_urlsafe(32)
+        with self.lock:
+            self.sessions[token] = (username, time.monotonic() + self.session_ttl)
+            if len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        return token
+
+    # Verify a password in the pool; the Future holds a session token, or None
+    def login(self, username, password):
+        return self.executor.submit(self._login, username, password)
+
+    # Username for a live session token, or None; never hashes
+    def authenticate(self, token):
+        with self.lock:
+            session = self.sessions.get(token)
+            if session is None:
+                return None
+            if session[1] < time.monotonic():
+                del self.sessions[token]
+                return None
+            self.sessions.move_to_end(token)
+            return session[0]
+
+    def logout(self, token):
+        with self.lock:
+            self.sessions.pop(token, None)
+
+    def close(self):
+        self.executor.shutdown()
+
+
+def main(argv=None):
+    import argparse
+    import getpass
+    import sqlite3
+    from Fitness import DB_PATH
+    parser = argparse.ArgumentParser(description="Manage Fitness Tracker accounts")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    add_parser = subcommands.add_parser("add-user", help="create an account; the password is prompted for")
+    add_parser.add_argument("username")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        migrate_legacy_users(conn)
+        create_table(conn)
+        password = getpass.getpass("Password for {}: ".format(args.username))
+        if password != getpass.getpass("Repeat the password: "):
+            print("Passwords do not match.")
+            return 1
+        try:
+            add_user(conn, args.username, password)
+        except sqlite3.IntegrityError:
+            print("User {} already exists.".format(args.username))
+            return 1
+    finally:
+        conn.close()
+    print("Added user {}.".format(args.username))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
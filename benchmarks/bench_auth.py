@@ -0,0 +1,40 @@
+# Benchmark: concurrent logins through the credential store's thread pool
+# Run from the repository root: python -m benchmarks.bench_auth [logins] [workers]
+import concurrent.futures
+import os
+import sys
+import tempfile
+import time
+
+import auth
+from repository import Database
+
+
+if __name__ == "__main__":
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 4
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        db = Database(path)
+        store = auth.CredentialStore(db, workers=workers)
+        users = ["user{}".format(number) for number in range(32)]
+        concurrent.futures.wait([store.register(user, "secret-" + user) for user in users])
+
+        start = time.perf_counter()
+        tokens = [future.result() for future in
+                  [store.login(users[i % len(users)], "secret-" + users[i % len(users)]) for i in range(logins)]]
+        elapsed = time.perf_counter() - start
+        assert all(tokens)
+        print("{:,} logins with {} workers: {:.2f} s ({:,.0f} logins/s)".format(logins, workers, elapsed, logins / elapsed))
+
+        start = time.perf_counter()
+        for _ in range(100):
+            for token in tokens:
+                store.authenticate(token)
+        elapsed = time.perf_counter() - start
+        print("{:,} session-token checks: {:.3f} s ({:,.0f} checks/s)".format(
+            100 * len(tokens), elapsed, 100 * len(tokens) / elapsed))
+
+        store.close()
+        db.close()
@@ -0,0 +1,59 @@
+# Benchmark: monthly calorie totals from SQL GROUP BY, summary tables and NumPy kernels
+# Run from the repository root: python -m benchmarks.bench_calorie_aggregates
+import datetime
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+import calorie_aggregates
+import daily_log
+
+USERS = 300
+DAYS = 3650
+
+
+def fill(conn):
+    first = datetime.date(2015, 1, 1).toordinal()
+    daily_log.create_table(conn)
+    calorie_aggregates.create_tables(conn)
+    with conn:
+        for user in range(USERS):
+            conn.executemany(daily_log.UPSERT_SQL,
+                             (("user{}".format(user), first + day, 2000.0 + day % 300, 1800.0 + day % 250)
+                              for day in range(DAYS)))
+    return first
+
+
+def timed(label, func, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    print("{:>28}: {:8.3f} ms".format(label, (time.perf_counter() - start) / repeat * 1000))
+    return result
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"))
+        start = time.perf_counter()
+        first = fill(conn)
+        print("loaded {} rows with incremental summaries in {:.1f} s".format(USERS * DAYS, time.perf_counter() - start))
+
+        begin = datetime.date.fromordinal(first)
+        end = datetime.date.fromordinal(first + DAYS - 1)
+        month = calorie_aggregates.period_sql("monthly", "day")
+
+        by_sql = timed("GROUP BY over daily_log", lambda: conn.execute(
+            "SELECT {0}, sum(intake), sum(expenditure) FROM daily_log WHERE username = ? GROUP BY {0}".format(month),
+            ("user7",)).fetchall())
+        by_summary = timed("monthly_summary read", lambda: calorie_aggregates.query_summary(
+            conn, "user7", "monthly", begin, end))
+        series = daily_log.query_range(conn, "user7", begin, end)
+        timed("NumPy 30-day rolling sum", lambda: calorie_aggregates.rolling_sum(
+            calorie_aggregates.densify(series.days, series.intake), 30))
+
+        assert np.allclose([row[1] for row in by_sql], by_summary[1])
+        conn.close()
@@ -0,0 +1,36 @@
+# Benchmark: calorie chart render time against the length of the log
+# Run from the repository root: python -m benchmarks.bench_calorie_lod
+# With level of detail, a 10-year chart should cost about as much as 30 days.
+import time
+
+import numpy as np
+
+import charts
+
+SPANS = (30, 365, 3650)
+RUNS = 3
+
+
+def render_ms(renderer, days, mode):
+    rng = np.random.default_rng(days)
+    dates = np.datetime64("2015-01-01") + np.arange(days)
+    best = float("inf")
+    for run in range(RUNS):
+        # Fresh values every run, so the chart cache never answers
+        intake = rng.uniform(1500, 3200, days)
+        expenditure = rng.uniform(1400, 3000, days)
+        start = time.perf_counter()
+        renderer.calorie_chart(dates, intake, expenditure, mode=mode)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+if __name__ == "__main__":
+    renderer = charts.ChartRenderer(cache_size=0)
+    for mode in ("bar", "line"):
+        for days in SPANS:
+            print("{:<4} {:>5} days: {:7.1f} ms".format(mode, days, render_ms(renderer, days, mode)))
+
+    # Every day drawn and labelled, as before level of detail
+    charts.DAILY_BARS = charts.LABEL_BARS = charts.MAX_TICKS = 10 ** 9
+    print("bar  {:>5} days: {:7.1f} ms without level of detail".format(365, render_ms(renderer, 365, "bar")))
@@ -0,0 +1,49 @@
+# Benchmark: rendering 1,000 charts with pyplot, the headless renderer and its cache
+# Run from the repository root: python -m benchmarks.bench_charts
+import datetime
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from charts import ChartRenderer
+
+CHARTS = 1000
+GOALS = 50
+
+
+def pyplot_pies():
+    for i in range(CHARTS):
+        progress = i % GOALS
+        plt.figure(figsize=(6, 6))
+        plt.pie([progress, 100 - progress], labels=['Progress Made', 'Remaining'], colors=['green', 'red'], autopct='%1.1f%%')
+        plt.title('Goal Progress')
+        plt.savefig("/dev/null", format="png")
+        plt.close()
+
+
+def renderer_pies(renderer):
+    for i in range(CHARTS):
+        renderer.pie_chart(i % GOALS, 100)
+
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    print("{:>32}: {:7.2f} s ({:.1f} ms/chart)".format(label, elapsed, elapsed / CHARTS * 1000))
+
+
+if __name__ == "__main__":
+    timed("pyplot, new figure per chart", pyplot_pies)
+    timed("renderer, no cache", renderer_pies, ChartRenderer(cache_size=0))
+    timed("renderer, {} distinct goals".format(GOALS), renderer_pies, ChartRenderer())
+
+    first = datetime.date(2024, 1, 1)
+    dates = [first + datetime.timedelta(days=day) for day in range(30)]
+    renderer = ChartRenderer(cache_size=0)
+    start = time.perf_counter()
+    for i in range(100):
+        renderer.calorie_chart(dates, [2000 + i] * 30, [1800] * 30)
+    print("{:>32}: {:7.1f} ms/chart".format("30-day calorie chart", (time.perf_counter() - start) * 10))
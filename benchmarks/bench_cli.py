@@ -0,0 +1,45 @@
+# Benchmark: scripted goal inserts through the CLI, one process per command
+# vs JSONL batches vs a long-running --serve-stdin process
+# Run from the repository root: python -m benchmarks.bench_cli [commands]
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import synthetic
+
+PROCESS_COMMANDS = 20
+
+
+def goal_records(count):
+    return [{"description": description, "target": target, "deadline": deadline.isoformat(), "username": username}
+            for description, target, deadline, _, username in synthetic.goals(synthetic.users(count), 1)]
+
+
+if __name__ == "__main__":
+    commands = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    with tempfile.TemporaryDirectory() as tmp:
+        cli = [sys.executable, "cli.py", "--db", os.path.join(tmp, "bench.db")]
+        records = goal_records(commands)
+
+        start = time.perf_counter()
+        for record in records[:PROCESS_COMMANDS]:
+            subprocess.run(cli + ["goals", "add", "--description", record["description"], "--target",
+                                  str(record["target"]), "--deadline", record["deadline"], "--username",
+                                  record["username"]], check=True, capture_output=True)
+        elapsed = time.perf_counter() - start
+        print("one process per command: {:9,.0f} commands/s".format(PROCESS_COMMANDS / elapsed))
+
+        lines = "".join(json.dumps(dict(record, command="goals add")) + "\n" for record in records)
+        start = time.perf_counter()
+        subprocess.run(cli + ["--serve-stdin"], input=lines, text=True, check=True, capture_output=True)
+        elapsed = time.perf_counter() - start
+        print("--serve-stdin:           {:9,.0f} commands/s ({:,} commands)".format(commands / elapsed, commands))
+
+        lines = "".join(json.dumps(record) + "\n" for record in records)
+        start = time.perf_counter()
+        subprocess.run(cli + ["goals", "add", "--batch"], input=lines, text=True, check=True, capture_output=True)
+        elapsed = time.perf_counter() - start
+        print("goals add --batch:       {:9,.0f} records/s ({:,} records, one transaction)".format(commands / elapsed, commands))
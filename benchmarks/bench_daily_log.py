@@ -0,0 +1,44 @@
+# Benchmark: 90-day range queries on a large daily calorie log
+# Run from the repository root: python -m benchmarks.bench_daily_log
+import datetime
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import daily_log
+
+USERS = 500
+DAYS = 3650
+QUERIES = 2000
+
+
+def fill(conn):
+    first = datetime.date(2015, 1, 1).toordinal()
+    daily_log.create_table(conn)
+    with conn:
+        for user in range(USERS):
+            conn.executemany(daily_log.UPSERT_SQL,
+                             (("user{}".format(user), first + day, 2000.0 + day % 300, 1800.0 + day % 250)
+                              for day in range(DAYS)))
+    return first
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"))
+        start = time.perf_counter()
+        first = fill(conn)
+        print("loaded {} rows in {:.1f} s".format(USERS * DAYS, time.perf_counter() - start))
+
+        rng = random.Random(1)
+        start = time.perf_counter()
+        for _ in range(QUERIES):
+            begin = datetime.date.fromordinal(first + rng.randrange(DAYS - 90))
+            series = daily_log.query_range(conn, "user{}".format(rng.randrange(USERS)),
+                                           begin, begin + datetime.timedelta(days=89))
+            assert len(series.days) == 90
+        elapsed = time.perf_counter() - start
+        print("90-day range query: {:.3f} ms".format(elapsed / QUERIES * 1000))
+        conn.close()
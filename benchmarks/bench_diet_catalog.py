@@ -0,0 +1,23 @@
+# Benchmark: diet catalog load, lookups, calorie-range filters and rendering
+# Run from the repository root: python -m benchmarks.bench_diet_catalog
+import time
+
+from diet_catalog import CATALOG_PATH, read_catalog
+
+LOOKUPS = 100000
+
+
+def timed(label, func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    print("{:>30}: {:9.2f} us".format(label, (time.perf_counter() - start) / repeat * 1e6))
+
+
+if __name__ == "__main__":
+    timed("load and index catalog", lambda: read_catalog(CATALOG_PATH), 100)
+    catalog = read_catalog(CATALOG_PATH)
+    timed("meal lookup", lambda: catalog.meal("weight_loss", 3, "lunch"), LOOKUPS)
+    timed("meals 300-500 kcal", lambda: catalog.meals_in_range("maintenance", 300, 500), LOOKUPS)
+    timed("days under 1,800 kcal", lambda: catalog.days_under("weight_loss", 1800), LOOKUPS)
+    timed("render plan (cached)", lambda: catalog.render("muscle_gain"), LOOKUPS)
@@ -0,0 +1,42 @@
+# Benchmark: bulk goal import and export throughput
+# Run from the repository root: python -m benchmarks.bench_goal_io
+# The import goes through the command line tool against the full schema, so
+# it pays for the goal indexes exactly as a real import does.
+import io
+import os
+import sqlite3
+import tempfile
+import time
+
+import goal_io
+from goal_io import export_goals, write_csv
+
+ROWS = 500000
+
+
+# Generate a CSV file of synthetic goals without holding it all in memory
+def write_sample(path):
+    with open(path, "w", newline="") as stream:
+        stream.write("description,target,deadline,progress,username\n")
+        for i in range(ROWS):
+            stream.write("Run {0} km,{0},2030-{1:02d}-{2:02d},0,user{3}\n".format(i % 100 + 1, i % 12 + 1, i % 28 + 1, i % 1000))
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "goals.csv")
+        db_path = os.path.join(tmp, "bench.db")
+        write_sample(csv_path)
+
+        start = time.perf_counter()
+        goal_io.main(["--db", db_path, "import", csv_path])
+        elapsed = time.perf_counter() - start
+        conn = sqlite3.connect(db_path)
+        imported = conn.execute("SELECT count(*) FROM goals").fetchone()[0]
+        print("import: {:>10.0f} rows/s ({} rows)".format(imported / elapsed, imported))
+
+        start = time.perf_counter()
+        exported = write_csv(io.StringIO(), export_goals(conn))
+        elapsed = time.perf_counter() - start
+        print("export: {:>10.0f} rows/s ({} rows)".format(exported / elapsed, exported))
+        conn.close()
@@ -0,0 +1,68 @@
+# Benchmark: memory and hydration time of Fitness.Goal vs. CompactGoal
+# Run from the repository root: python -m benchmarks.bench_goal_model [goals]
+import datetime
+import gc
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import repository
+from Fitness import Goal
+from goal_model import load_goals
+
+
+def fill(conn, goals):
+    repository.create_schema(conn)
+    first = datetime.date.today().toordinal()
+    with conn:
+        conn.executemany(repository.INSERT_GOAL_SQL, (
+            ("goal {}".format(i % 100), 100, datetime.date.fromordinal(first + i % 1000).isoformat(),
+             i % 120, "user{}".format(i % 10000))
+            for i in range(goals)))
+
+
+def load_plain_goals(conn):
+    goals = []
+    for goal_id, description, target, deadline, progress, username in conn.execute(
+            "SELECT id, description, target, deadline, progress, username FROM goals ORDER BY id"):
+        goal = Goal(description, target, datetime.date.fromisoformat(deadline), username)
+        goal.id = goal_id
+        goal.progress = progress
+        goals.append(goal)
+    return goals
+
+
+def measure(label, loader, conn):
+    gc.collect()
+    start = time.perf_counter()
+    goals = loader(conn)
+    elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    active = sum(1 for goal in goals if not goal.is_complete() and goal.days_remaining() > 0)
+    scan = time.perf_counter() - start
+    del goals
+
+    # Measure memory on a second load, so tracing does not distort the timings
+    gc.collect()
+    tracemalloc.start()
+    goals = loader(conn)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del goals
+
+    print("{:>12}: hydrate {:.2f} s, {:.0f} MB, active scan {:.2f} s ({} active)".format(
+        label, elapsed, memory / 2 ** 20, scan, active))
+
+
+if __name__ == "__main__":
+    goals = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"))
+        fill(conn, goals)
+        measure("Goal", load_plain_goals, conn)
+        measure("CompactGoal", load_goals, conn)
+        conn.close()
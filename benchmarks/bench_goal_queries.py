@@ -0,0 +1,59 @@
+# Benchmark: per-user goal listing queries on a large goals table
+# Run from the repository root: python -m benchmarks.bench_goal_queries [goals]
+# Exits with status 1 if any listing query would scan the goals table.
+import datetime
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import repository
+from repository import Database, GoalRepository
+
+USERS = 10000
+QUERIES = 2000
+
+
+def fill(path, goals):
+    conn = sqlite3.connect(path)
+    repository.create_schema(conn)
+    rng = random.Random(1)
+    first = datetime.date(2020, 1, 1).toordinal()
+    with conn:
+        conn.executemany(repository.INSERT_GOAL_SQL, (
+            ("goal {}".format(i), 100, datetime.date.fromordinal(first + rng.randrange(3650)).isoformat(),
+             rng.randrange(120), "user{}".format(rng.randrange(USERS)))
+            for i in range(goals)))
+    conn.execute("ANALYZE")
+    failures = repository.unindexed_queries(conn)
+    conn.close()
+    return failures
+
+
+if __name__ == "__main__":
+    goals = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        start = time.perf_counter()
+        failures = fill(path, goals)
+        print("loaded {:,} goals in {:.1f} s".format(goals, time.perf_counter() - start))
+
+        db = Database(path)
+        repo = GoalRepository(db)
+        today = datetime.date(2025, 1, 1)
+        rng = random.Random(2)
+        for name, query in (("for_user", lambda user: repo.for_user(user)),
+                            ("active", lambda user: repo.active(user, today)),
+                            ("overdue", lambda user: repo.overdue(user, today)),
+                            ("near_complete", lambda user: repo.near_complete(user, 0.9))):
+            start = time.perf_counter()
+            for _ in range(QUERIES):
+                query("user{}".format(rng.randrange(USERS)))
+            print("{:>14}: {:.3f} ms/query".format(name, (time.perf_counter() - start) / QUERIES * 1000))
+        db.close()
+
+    if failures:
+        print("full table scan in: {}".format(", ".join(failures)))
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,90 @@
+# Benchmark: reading calorie history from SQLite vs the memory-mapped archive
+# Run from the repository root: python -m benchmarks.bench_history_archive [rows]
+# Each synthetic user has ten years of daily entries; the default is 100M rows
+# (about 27,000 users), which needs several GB of disk for the SQLite copy.
+import datetime
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import daily_log
+import history_archive
+import progress_events
+
+DAYS_PER_USER = 3650
+LOOKUPS = 1000
+
+
+def build_database(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    daily_log.create_table(conn)
+    progress_events.create_tables(conn)
+    rng = np.random.default_rng(1)
+    first = datetime.date(2015, 1, 1).toordinal()
+    days = list(range(first, first + DAYS_PER_USER))
+    users = -(-rows // DAYS_PER_USER)
+    with conn:
+        for number in range(users):
+            username = "user{:06d}".format(number)
+            count = min(DAYS_PER_USER, rows - number * DAYS_PER_USER)
+            conn.executemany(daily_log.UPSERT_SQL, zip([username] * count, days[:count],
+                                                       rng.uniform(1500, 3200, count).round().tolist(),
+                                                       rng.uniform(1400, 3000, count).round().tolist()))
+    return conn, users
+
+
+def best_of(func, runs=3):
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def disk_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+if __name__ == "__main__":
+    rows = int(float(sys.argv[1])) if len(sys.argv) > 1 else 100_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        archive_path = os.path.join(tmp, "archive")
+
+        start = time.perf_counter()
+        conn, users = build_database(db_path, rows)
+        print("built SQLite with {:,} rows for {:,} users in {:.1f} s".format(rows, users, time.perf_counter() - start))
+
+        start = time.perf_counter()
+        history_archive.export(conn, archive_path, datetime.date(2030, 1, 1))
+        print("exported archive in {:.1f} s".format(time.perf_counter() - start))
+        print("size: SQLite {:,.0f} MB, archive {:,.0f} MB".format(disk_size(db_path) / 1e6, disk_size(archive_path) / 1e6))
+        archive = history_archive.HistoryArchive(archive_path)
+
+        rng = random.Random(1)
+        lookups = [("user{:06d}".format(rng.randrange(users)), datetime.date(2015, 1, 1) + datetime.timedelta(days=rng.randrange(3000)))
+                   for _ in range(LOOKUPS)]
+
+        for label, span in (("90-day range", 89), ("full history", DAYS_PER_USER)):
+            sqlite_time = best_of(lambda: [daily_log.query_range(conn, username, day, day + datetime.timedelta(days=span)).intake.sum()
+                                           for username, day in lookups])
+            archive_time = best_of(lambda: [archive.calories(username, day, day + datetime.timedelta(days=span)).intake.sum()
+                                            for username, day in lookups])
+            print("{:<13} SQLite {:8.3f} ms/read, archive {:8.3f} ms/read ({:.0f}x)".format(
+                label, sqlite_time / LOOKUPS * 1000, archive_time / LOOKUPS * 1000, sqlite_time / archive_time))
+
+        sqlite_time = best_of(lambda: conn.execute("SELECT username, total(intake) FROM daily_log GROUP BY username").fetchall(), 1)
+        archive_time = best_of(lambda: archive.calorie_totals(), 1)
+        print("{:<13} SQLite {:8.2f} s, archive {:8.2f} s ({:.0f}x)".format("per-user sums", sqlite_time, archive_time,
+                                                                           sqlite_time / archive_time))
+        conn.close()
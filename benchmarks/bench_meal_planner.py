@@ -0,0 +1,32 @@
+# Benchmark: generating calorie-target meal plans for a batch of users
+# Run from the repository root: python -m benchmarks.bench_meal_planner
+import random
+import time
+
+from meal_planner import GOAL_ADJUSTMENTS, MealPlanner, plan_batch
+
+USERS = 10000
+
+
+def people(count, seed=1):
+    rng = random.Random(seed)
+    goals = list(GOAL_ADJUSTMENTS)
+    for _ in range(count):
+        yield rng.uniform(45, 120), rng.uniform(150, 200), rng.randint(18, 75), rng.choice(goals)
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    planner = MealPlanner()
+    print("planner setup: {:.1f} ms".format((time.perf_counter() - start) * 1000))
+
+    start = time.perf_counter()
+    plans = plan_batch(people(USERS), planner=planner)
+    elapsed = time.perf_counter() - start
+    hit = sum(plan.within_tolerance for plan in plans)
+    print("{} users: {:.2f} s ({} distinct weeks, {} within tolerance)".format(
+        USERS, elapsed, len(planner._weeks), hit))
+
+    start = time.perf_counter()
+    plan_batch(people(USERS, seed=2), planner=MealPlanner())
+    print("{} users, cold planner: {:.2f} s".format(USERS, time.perf_counter() - start))
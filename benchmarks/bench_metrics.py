@@ -0,0 +1,31 @@
+# Benchmark: per-call cost of the instrumentation, disabled and enabled
+# Run from the repository root: python -m benchmarks.bench_metrics [calls]
+import sys
+import timeit
+
+import metrics
+
+
+def work():
+    return None
+
+
+def per_call_ns(func, calls):
+    return min(timeit.repeat(func, number=calls, repeat=5)) / calls * 1e9
+
+
+def in_timer():
+    with metrics.timer("bench.block"):
+        pass
+
+
+if __name__ == "__main__":
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    baseline = per_call_ns(work, calls)
+
+    for enabled in (False, True):
+        metrics.ENABLED = enabled
+        decorated = metrics.timed("bench.call")(work)
+        print("{:8}: timed() {:6.1f} ns/call, timer() {:6.1f} ns/block (plain call {:.1f} ns)".format(
+            "enabled" if enabled else "disabled", per_call_ns(decorated, calls) - baseline,
+            per_call_ns(in_timer, calls) - baseline, baseline))
@@ -0,0 +1,54 @@
+# Benchmark: batched event appends, compaction and per-goal time-series queries
+# Run from the repository root: python -m benchmarks.bench_progress_events [events]
+import datetime
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import progress_events
+import repository
+
+GOALS = 10000
+QUERIES = 500
+
+
+if __name__ == "__main__":
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"))
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        repository.create_schema(conn)
+        with conn:
+            conn.executemany(repository.INSERT_GOAL_SQL, (
+                ("goal {}".format(i), 100000, "2030-01-01", 0, "user{}".format(i % 1000)) for i in range(GOALS)))
+
+        log = progress_events.ProgressEventLog(conn, max_events=50000)
+        rng = random.Random(1)
+        first = time.time() - 365 * progress_events.SECONDS_PER_DAY
+        span = 365 * progress_events.SECONDS_PER_DAY
+        start = time.perf_counter()
+        for _ in range(events):
+            log.record(rng.randrange(1, GOALS + 1), rng.randrange(1, 10), first + rng.randrange(span))
+        log.flush()
+        elapsed = time.perf_counter() - start
+        print("append: {:,.0f} events/s".format(events / elapsed))
+
+        start = time.perf_counter()
+        compacted = log.compact()
+        print("compact {:,} events: {:.2f} s".format(compacted, time.perf_counter() - start))
+
+        today = datetime.date.today()
+        for name, query in (("current_progress", lambda goal: progress_events.current_progress(conn, goal)),
+                            ("daily_pace", lambda goal: progress_events.daily_pace(conn, goal)),
+                            ("burndown", lambda goal: progress_events.burndown(conn, goal)),
+                            ("projected_completion",
+                             lambda goal: progress_events.projected_completion(conn, goal, today=today))):
+            start = time.perf_counter()
+            for _ in range(QUERIES):
+                query(rng.randrange(1, GOALS + 1))
+            print("{:>20}: {:.3f} ms/query".format(name, (time.perf_counter() - start) / QUERIES * 1000))
+        conn.close()
@@ -0,0 +1,47 @@
+# Benchmark: per-update commits vs. the write-behind progress journal
+# Run from the repository root: python -m benchmarks.bench_progress_journal
+import os
+import sqlite3
+import tempfile
+import time
+
+import progress_events
+from progress_journal import BATCHED, SYNC, WAL, ProgressJournal
+
+GOALS = 100
+EVENTS = 5000
+
+
+def make_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute('''CREATE TABLE goals (
+                    id INTEGER PRIMARY KEY,
+                    description TEXT,
+                    target INTEGER,
+                    deadline TEXT,
+                    progress INTEGER,
+                    username TEXT
+                    )''')
+    conn.executemany("INSERT INTO goals (description, target, deadline, progress, username) VALUES (?, ?, ?, ?, ?)",
+                     [("goal {}".format(i), 1000, "2030-01-01", 0, "bench") for i in range(GOALS)])
+    conn.commit()
+    progress_events.create_tables(conn)
+    return conn
+
+
+def run(mode):
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = make_db(os.path.join(tmp, "bench.db"))
+        journal = ProgressJournal(conn, mode=mode)
+        start = time.perf_counter()
+        for i in range(EVENTS):
+            journal.record(i % GOALS + 1, 1)
+        journal.flush()
+        elapsed = time.perf_counter() - start
+        conn.close()
+    print("{:>8}: {:>10.0f} updates/s".format(mode, EVENTS / elapsed))
+
+
+if __name__ == "__main__":
+    for mode in (SYNC, BATCHED, WAL):
+        run(mode)
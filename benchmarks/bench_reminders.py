@@ -0,0 +1,36 @@
+# Benchmark: deadline scheduler with millions of goals
+# Run from the repository root: python -m benchmarks.bench_reminders [goals]
+import datetime
+import random
+import sys
+import time
+
+from reminders import DeadlineScheduler
+
+
+if __name__ == "__main__":
+    goals = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = random.Random(1)
+    today = datetime.date(2025, 1, 1).toordinal()
+    fired = []
+    scheduler = DeadlineScheduler(callbacks=[lambda goal_id, deadline, lead: fired.append(goal_id)])
+
+    start = time.perf_counter()
+    for goal_id in range(goals):
+        scheduler.add(goal_id, today + rng.randrange(365), today)
+    elapsed = time.perf_counter() - start
+    print("add {:,} goals: {:.2f} s ({:.2f} us/insert)".format(goals, elapsed, elapsed / goals * 1e6))
+
+    start = time.perf_counter()
+    for goal_id in range(0, goals, 4):
+        scheduler.complete(goal_id)
+    for goal_id in range(1, goals, 4):
+        scheduler.add(goal_id, today + rng.randrange(365), today)
+    print("complete/reschedule {:,} goals: {:.2f} s".format(goals // 2, time.perf_counter() - start))
+
+    start = time.perf_counter()
+    for day in range(today, today + 400):
+        scheduler.run_due(day)
+    elapsed = time.perf_counter() - start
+    print("simulate 400 days: {:,} reminders in {:.2f} s ({:.2f} us/pop)".format(
+        len(fired), elapsed, elapsed / max(len(fired), 1) * 1e6))
@@ -0,0 +1,52 @@
+# Benchmark: report generation throughput against the number of worker processes
+# Run from the repository root: python -m benchmarks.bench_report [users] [max_workers]
+# Rendering is CPU bound, so users/s should grow close to linearly up to the
+# number of cores; the last line times an incremental run with nothing changed.
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import daily_log
+import report
+import repository
+from benchmarks import synthetic
+
+
+def build_database(path, users):
+    conn = sqlite3.connect(path)
+    repository.create_schema(conn)
+    usernames = synthetic.users(users)
+    with conn:
+        conn.executemany("INSERT INTO goals (description, target, deadline, progress, username) VALUES (?, ?, ?, ?, ?)",
+                         [(description, target, deadline.isoformat(), progress, username)
+                          for description, target, deadline, progress, username in synthetic.goals(usernames, 2)])
+    for username, entries in synthetic.daily_logs(usernames, 30):
+        daily_log.upsert_days(conn, username, entries)
+    conn.close()
+
+
+if __name__ == "__main__":
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    print("{} CPUs, {} users with 2 goals and 30 days of calories each".format(os.cpu_count(), users))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        build_database(path, users)
+
+        baseline = None
+        workers = 1
+        while workers <= max_workers:
+            out = os.path.join(tmp, "out{}".format(workers))
+            start = time.perf_counter()
+            rendered, _, _ = report.generate(path, out, workers, days=30, full=True)
+            rate = rendered / (time.perf_counter() - start)
+            baseline = baseline or rate
+            print("{:>3} workers: {:6.1f} users/s ({:.2f}x)".format(workers, rate, rate / baseline))
+            workers *= 2
+
+        start = time.perf_counter()
+        _, skipped, _ = report.generate(path, out, max_workers, days=30)
+        print("incremental run, {} unchanged users skipped: {:.2f} s".format(skipped, time.perf_counter() - start))
@@ -0,0 +1,72 @@
+# Load test: concurrent goal reads and writes through the repository layer
+# Run from the repository root: python -m benchmarks.bench_repository [readers] [writers] [seconds]
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from repository import Database, GoalRepository
+
+USERS = 1000
+GOALS = 50000
+
+
+def load(repo):
+    futures = [repo.add("goal {}".format(i), 100, "2030-01-01", "user{}".format(i % USERS)) for i in range(GOALS)]
+    futures[-1].result()
+
+
+def reader(repo, stop, counts, index):
+    rng = random.Random(index)
+    done = 0
+    while not stop.is_set():
+        if done % 2:
+            repo.get(rng.randrange(1, GOALS + 1))
+        else:
+            repo.for_user("user{}".format(rng.randrange(USERS)))
+        done += 1
+    counts[index] = done
+
+
+def writer(repo, stop, counts, index):
+    rng = random.Random(-index)
+    done = 0
+    while not stop.is_set():
+        # Keep a bounded number of writes in flight per thread
+        pending = [repo.update_progress(rng.randrange(1, GOALS + 1), rng.randrange(100)) for _ in range(32)]
+        for future in pending:
+            future.result()
+        done += len(pending)
+    counts[index] = done
+
+
+def run(readers, writers, seconds):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        repo = GoalRepository(db)
+        load(repo)
+
+        stop = threading.Event()
+        read_counts = [0] * readers
+        write_counts = [0] * writers
+        threads = [threading.Thread(target=reader, args=(repo, stop, read_counts, i)) for i in range(readers)]
+        threads += [threading.Thread(target=writer, args=(repo, stop, write_counts, i)) for i in range(writers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        db.close()
+
+    print("{} readers, {} writers: {:>9.0f} reads/s {:>9.0f} writes/s".format(
+        readers, writers, sum(read_counts) / seconds, sum(write_counts) / seconds))
+
+
+if __name__ == "__main__":
+    readers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    writers = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 3
+    run(readers, writers, seconds)
@@ -0,0 +1,102 @@
+# Load test: concurrent clients against the HTTP/JSON service, with latency percentiles
+# Run from the repository root: python -m benchmarks.bench_service [clients] [requests_per_client]
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from service import FitnessService
+
+USERS = 100
+GOALS = 2000
+PASSWORD = "bench-password"
+
+
+class Client:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.token = None
+
+    @classmethod
+    async def connect(cls, port):
+        return cls(*await asyncio.open_connection("127.0.0.1", port))
+
+    async def request(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else b""
+        auth = "Authorization: Bearer {}\r\n".format(self.token) if self.token else ""
+        self.writer.write("{} {} HTTP/1.1\r\nHost: localhost\r\n{}Content-Length: {}\r\n\r\n"
+                          .format(method, path, auth, len(data)).encode() + data)
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    def close(self):
+        self.writer.close()
+
+
+# Each client logs in as one user and works on that user's goals
+async def client_session(port, requests, seed, latencies):
+    rng = random.Random(seed)
+    user = seed % USERS
+    # Goal i + 1 belongs to user i % USERS
+    goal_ids = range(user + 1, GOALS + 1, USERS)
+    client = await Client.connect(port)
+    _, result = await client.request("POST", "/login", {"username": "user{}".format(user), "password": PASSWORD})
+    client.token = result["token"]
+    for _ in range(requests):
+        kind = rng.random()
+        start = time.perf_counter()
+        if kind < 0.5:
+            await client.request("GET", "/goals/{}".format(rng.choice(goal_ids)))
+        elif kind < 0.7:
+            await client.request("GET", "/goals")
+        elif kind < 0.9:
+            await client.request("POST", "/goals/{}/progress".format(rng.choice(goal_ids)), {"amount": 1})
+        else:
+            await client.request("POST", "/bmi", {"weight": 70, "height_cm": 175, "age": 30})
+        latencies.append((time.perf_counter() - start) * 1000)
+    client.close()
+
+
+async def main(clients, requests):
+    with tempfile.TemporaryDirectory() as tmp:
+        service = FitnessService(os.path.join(tmp, "bench.db"))
+        for i in range(GOALS):
+            future = service.goals.add("goal {}".format(i), 100, "2030-01-01", "user{}".format(i % USERS))
+        future.result()
+        for future in [service.credentials.register("user{}".format(user), PASSWORD)
+                       for user in range(min(clients, USERS))]:
+            future.result()
+        server = await service.start("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+
+        latencies = []
+        start = time.perf_counter()
+        await asyncio.gather(*(client_session(port, requests, seed, latencies) for seed in range(clients)))
+        elapsed = time.perf_counter() - start
+
+        server.close()
+        await server.wait_closed()
+        service.close()
+
+    latencies.sort()
+    pick = lambda q: latencies[min(int(q * len(latencies)), len(latencies) - 1)]
+    print("{} clients x {} requests: {:.0f} req/s, p50 {:.2f} ms, p90 {:.2f} ms, p99 {:.2f} ms".format(
+        clients, requests, len(latencies) / elapsed, pick(0.5), pick(0.9), pick(0.99)))
+
+
+if __name__ == "__main__":
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    asyncio.run(main(clients, requests))
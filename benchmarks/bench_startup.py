@@ -0,0 +1,78 @@
+# Benchmark: interpreter start through login to the main menu, with an import-time breakdown
+# Run from the repository root: python -m benchmarks.bench_startup [budget_ms]
+# Exits with status 1 when the median time-to-menu is over the budget.
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+BUDGET_MS = 300
+RUNS = 5
+HEAVY_MODULES = ("matplotlib", "seaborn", "numpy", "sqlite3.dbapi2")
+USERNAME = "bench"
+PASSWORD = "bench-password"
+
+
+# A database holding the account the benchmark logs in with
+def make_db(path):
+    import auth
+    import repository
+    conn = sqlite3.connect(path)
+    repository.create_schema(conn)
+    auth.add_user(conn, USERNAME, PASSWORD)
+    conn.close()
+
+
+# Start the app, log in and wait for the main menu; returns milliseconds
+def time_to_menu(env):
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "Fitness.py"], stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env)
+    process.stdin.write("{}\n{}\n".format(USERNAME, PASSWORD).encode())
+    process.stdin.flush()
+    output = b""
+    while b"Enter your choice:" not in output:
+        chunk = process.stdout.read1(1024)
+        if not chunk:
+            break
+        output += chunk
+    elapsed = (time.perf_counter() - start) * 1000
+    process.kill()
+    process.wait()
+    if b"Enter your choice:" not in output:
+        raise RuntimeError("the app exited before showing the menu: {!r}".format(output[-200:]))
+    return elapsed
+
+
+# Cumulative import times in microseconds, from python -X importtime
+def import_times(env):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import Fitness"],
+                            capture_output=True, text=True, env=env)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+if __name__ == "__main__":
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else BUDGET_MS
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, FITNESS_DB=os.path.join(tmp, "bench.db"))
+        make_db(env["FITNESS_DB"])
+
+        times = import_times(env)
+        print("import Fitness: {:.1f} ms".format(times.get("Fitness", 0) / 1000))
+        for name in HEAVY_MODULES:
+            print("  {:<16} {}".format(name, "loaded" if name in times else "not loaded"))
+
+        samples = sorted(time_to_menu(env) for _ in range(RUNS))
+        median = samples[len(samples) // 2]
+        print("time to menu: {:.1f} ms (budget {:.0f} ms)".format(median, budget))
+
+    sys.exit(0 if median <= budget else 1)
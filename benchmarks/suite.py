@@ -0,0 +1,204 @@
+# Benchmark suite for the tracker's hot paths, gated against a stored baseline
+# Run from the repository root:
+#   python -m benchmarks.suite [--quick] [--output results.json] [--threshold 0.3]
+#   python -m benchmarks.suite [--quick] --update-baseline
+# Exits with status 1 when a case's throughput falls more than the threshold
+# below the baseline. Full and --quick runs keep separate baselines
+# (benchmarks/baseline.json and baseline-quick.json), since some cases (plan
+# memoization, per-call setup) scale with the operation count. Baselines are
+# machine specific: record one per machine.
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from benchmarks import synthetic
+
+BASELINE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_THRESHOLD = 0.3
+REPEATS = 5
+
+# name -> (function, operations, operations with --quick)
+CASES = {}
+
+
+def case(name, operations, quick_operations):
+    def register(func):
+        CASES[name] = (func, operations, quick_operations)
+        return func
+    return register
+
+
+# Each case prepares its data, then times `count` operations and returns the seconds taken
+
+@case("goal_insert", 500, 200)
+def goal_insert(count, workdir, round_number):
+    from Fitness import Goal
+    goals = [Goal(description, target, deadline, username) for description, target, deadline, _, username in
+             synthetic.goals(synthetic.users(count), 1, seed=round_number)]
+    start = time.perf_counter()
+    for goal in goals:
+        goal.save_to_database()
+    return time.perf_counter() - start
+
+
+@case("progress_update", 50000, 20000)
+def progress_update(count, workdir, round_number):
+    from Fitness import Goal
+    goals = [Goal(description, target, deadline, username) for description, target, deadline, _, username in
+             synthetic.goals(synthetic.users(100), 1, seed=round_number)]
+    for goal in goals:
+        goal.save_to_database()
+    start = time.perf_counter()
+    for number in range(count):
+        goal = goals[number % len(goals)]
+        goal.update_progress(1)
+        goal.update_progress_in_db()
+    Goal.flush()
+    return time.perf_counter() - start
+
+
+@case("bmi_scalar", 200000, 20000)
+def bmi_scalar(count, workdir, round_number):
+    import body_metrics
+    people = synthetic.people(count, seed=round_number)
+    start = time.perf_counter()
+    for weight, height_cm, age, _ in people:
+        body_metrics.bmi_category(body_metrics.compute_bmi(weight, height_cm))
+    return time.perf_counter() - start
+
+
+@case("bmi_batch", 5000000, 500000)
+def bmi_batch(count, workdir, round_number):
+    import numpy as np
+    import body_metrics
+    rng = np.random.default_rng(round_number)
+    weight = rng.uniform(40, 150, count).astype(np.float32)
+    height_cm = rng.uniform(140, 210, count).astype(np.float32)
+    age = rng.integers(18, 90, count).astype(np.float32)
+    start = time.perf_counter()
+    body_metrics.compute_batch(weight, height_cm, age)
+    return time.perf_counter() - start
+
+
+@case("diet_plan", 2000, 200)
+def diet_plan(count, workdir, round_number):
+    import meal_planner
+    people = synthetic.people(count, seed=round_number)
+    start = time.perf_counter()
+    meal_planner.plan_batch(people, planner=meal_planner.MealPlanner())
+    return time.perf_counter() - start
+
+
+@case("pie_render", 20, 4)
+def pie_render(count, workdir, round_number):
+    from Fitness import Goal, Visualization
+    import charts
+    charts.get_renderer()
+    path = os.path.join(workdir, "pie.png")
+    goals = []
+    for number in range(count):
+        # Distinct progress values, so every render misses the chart cache
+        goal = Goal("Run 100 km", 10 ** 9, None, "user")
+        goal.progress = (round_number * count + number) * 7919 % goal.target
+        goals.append(goal)
+    start = time.perf_counter()
+    for goal in goals:
+        Visualization.generate_pie_chart(goal, path)
+    return time.perf_counter() - start
+
+
+@case("calorie_render", 10, 3)
+def calorie_render(count, workdir, round_number):
+    from Fitness import plot_calorie_graph
+    import charts
+    charts.get_renderer()
+    path = os.path.join(workdir, "calories.png")
+    logs = [synthetic.daily_log(30, seed=round_number * count + number) for number in range(count)]
+    start = time.perf_counter()
+    for daily_data in logs:
+        plot_calorie_graph(daily_data, path)
+    return time.perf_counter() - start
+
+
+def run(names, quick, workdir):
+    results = {}
+    for name in names:
+        func, operations, quick_operations = CASES[name]
+        count = quick_operations if quick else operations
+        best = min(func(count, workdir, round_number) for round_number in range(1, REPEATS + 1))
+        results[name] = {"operations": count, "seconds": best, "ops_per_sec": count / best}
+        print("{:<16} {:>14,.1f} ops/s".format(name, count / best), flush=True)
+    return results
+
+
+# Names of the cases that fell more than `threshold` below the baseline
+def regressions(results, baseline, threshold):
+    failed = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None or expected["operations"] != result["operations"]:
+            print("{:<16} no comparable baseline".format(name))
+            continue
+        ratio = result["ops_per_sec"] / expected["ops_per_sec"]
+        print("{:<16} {:>7.2f}x baseline{}".format(name, ratio, "  REGRESSION" if ratio < 1 - threshold else ""))
+        if ratio < 1 - threshold:
+            failed.append(name)
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the tracker's hot paths against a stored baseline")
+    parser.add_argument("cases", nargs="*", help="cases to run (default: all): " + ", ".join(CASES))
+    parser.add_argument("--quick", action="store_true", help="fewer operations per case")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="baseline results to compare against (default: benchmarks/baseline.json,"
+                                           " or baseline-quick.json with --quick)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed throughput drop as a fraction of the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="save the results as the new baseline")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.cases if name not in CASES]
+    if unknown:
+        parser.error("unknown cases: {}".format(", ".join(unknown)))
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, "baseline-quick.json" if args.quick else "baseline.json")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Fitness reads its settings at import, so point it at a scratch database first
+        os.environ["FITNESS_DB"] = os.path.join(workdir, "bench.db")
+        os.environ.pop("FITNESS_CHART_CACHE", None)
+        import Fitness
+        results = run(args.cases or list(CASES), args.quick, workdir)
+        Fitness.Goal.flush()
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "quick": args.quick,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as stream:
+            json.dump(report, stream, indent=2)
+    if args.update_baseline:
+        with open(baseline_path, "w", encoding="utf-8") as stream:
+            json.dump(report, stream, indent=2)
+        print("baseline written to {}".format(baseline_path))
+        return 0
+
+    if not os.path.exists(baseline_path):
+        print("no baseline at {}; run with --update-baseline to record one".format(baseline_path))
+        return 0
+    with open(baseline_path, encoding="utf-8") as stream:
+        baseline = json.load(stream)["results"]
+    failed = regressions(results, baseline, args.threshold)
+    if failed:
+        print("regressed beyond {:.0%}: {}".format(args.threshold, ", ".join(failed)))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+# Synthetic data generators for the benchmarks.
+# Every generator takes a seed, so a benchmark sees the same data on every run.
+import datetime
+import random
+
+import diet_catalog
+
+GOAL_DESCRIPTIONS = ("Run 100 km", "Walk 10,000 steps a day", "Do 500 push-ups", "Swim 20 km",
+                     "Cycle 300 km", "Lose 5 kg", "Gain 3 kg of muscle", "Stretch 30 minutes a day")
+
+
+def users(count):
+    return ["user{:06d}".format(number) for number in range(count)]
+
+
+# (description, target, deadline, progress, username) for `per_user` goals per user
+def goals(usernames, per_user=5, seed=1, today=None):
+    rng = random.Random(seed)
+    today = today or datetime.date.today()
+    for username in usernames:
+        for _ in range(per_user):
+            target = rng.randrange(10, 1000)
+            yield (rng.choice(GOAL_DESCRIPTIONS), target, today + datetime.timedelta(days=rng.randrange(-30, 365)),
+                   rng.randrange(target), username)
+
+
+# (date, intake, expenditure) for `days` consecutive days ending on `end`
+def daily_log(days, seed=1, end=None):
+    rng = random.Random(seed)
+    end = end or datetime.date.today()
+    start = end - datetime.timedelta(days=days - 1)
+    return [((start + datetime.timedelta(days=offset)).isoformat(),
+             float(rng.randrange(1500, 3200)), float(rng.randrange(1400, 3000))) for offset in range(days)]
+
+
+# (username, [(date, intake, expenditure), ...]) per user
+def daily_logs(usernames, days, seed=1, end=None):
+    for index, username in enumerate(usernames):
+        yield username, daily_log(days, seed * 100003 + index, end)
+
+
+# (weight, height_cm, age, goal) tuples, as taken by meal_planner.plan_batch
+def people(count, seed=1):
+    rng = random.Random(seed)
+    goal_names = sorted(set(diet_catalog.GOAL_CHOICES.values()))
+    return [(round(rng.uniform(45, 130), 1), round(rng.uniform(150, 200), 1), rng.randrange(18, 80),
+             rng.choice(goal_names)) for _ in range(count)]
@@ -0,0 +1,88 @@
+import collections
+
+# BMI category boundaries; a BMI equal to a boundary falls in the higher band
+BMI_BINS = (18.5, 25.0, 30.0)
+BMI_CATEGORIES = ("Underweight", "Normal weight", "Overweight", "Obese")
+
+# Activity multipliers for total daily energy expenditure
+ACTIVITY_FACTORS = {
+    "sedentary": 1.2,
+    "light": 1.375,
+    "moderate": 1.55,
+    "active": 1.725,
+    "very_active": 1.9,
+}
+
+# Results of a batch computation: one NumPy array per metric.
+# category holds indexes into BMI_CATEGORIES.
+CohortMetrics = collections.namedtuple("CohortMetrics", ["bmi", "category", "bmr", "tdee"])
+
+
+# The scalar functions below work on plain numbers and also on NumPy arrays;
+# NumPy itself is only imported by the batch functions.
+
+def compute_bmi(weight, height_cm):
+    height_meter = height_cm / 100
+    return weight / (height_meter ** 2)
+
+
+def bmi_category(bmi):
+    if bmi < 18.5:
+        return "Underweight"
+    elif bmi < 25:
+        return "Normal weight"
+    elif bmi < 30:
+        return "Overweight"
+    return "Obese"
+
+
+# Mifflin-St Jeor basal metabolic rate in kcal/day. Without a recorded sex the
+# constant is the midpoint of the male (+5) and female (-161) terms.
+def basal_metabolic_rate(weight, height_cm, age, sex=None):
+    constant = {"male": 5, "female": -161}.get(sex, -78)
+    return 10 * weight + 6.25 * height_cm - 5 * age + constant
+
+
+# Total daily energy expenditure: BMR scaled by an activity factor
+def total_daily_energy(weight, height_cm, age, activity="moderate", sex=None):
+    return basal_metabolic_rate(weight, height_cm, age, sex) * ACTIVITY_FACTORS[activity]
+
+
+# Vectorized BMI category codes (indexes into BMI_CATEGORIES)
+def categorize(bmi):
+    import numpy as np
+    return np.digitize(bmi, BMI_BINS).astype(np.int8)
+
+
+# Score a whole cohort at once from weight (kg), height (cm) and age arrays
+def compute_batch(weight, height_cm, age, activity="moderate"):
+    import numpy as np
+    weight = np.asarray(weight)
+    height_cm = np.asarray(height_cm)
+    age = np.asarray(age)
+
+    # weight * 10000 / height_cm**2, reusing one buffer for the intermediate steps
+    bmi = np.multiply(height_cm, height_cm, dtype=np.result_type(weight, height_cm, np.float32))
+    np.divide(weight, bmi, out=bmi)
+    bmi *= 10000
+
+    bmr = basal_metabolic_rate(weight, height_cm, age).astype(bmi.dtype, copy=False)
+    tdee = bmr * ACTIVITY_FACTORS[activity]
+    return CohortMetrics(bmi, categorize(bmi), bmr, tdee)
+
+
+# Category names for an array of category codes
+def category_names(codes):
+    import numpy as np
+    return np.asarray(BMI_CATEGORIES)[codes]
+
+
+# Score a columnar file: an .npz archive or a CSV with a header, holding
+# weight, height_cm and age columns
+def compute_file(path, activity="moderate"):
+    import numpy as np
+    if path.endswith(".npz"):
+        with np.load(path) as columns:
+            return compute_batch(columns["weight"], columns["height_cm"], columns["age"], activity)
+    columns = np.genfromtxt(path, delimiter=",", names=True, dtype=np.float64)
+    return compute_batch(columns["weight"], columns["height_cm"], columns["age"], activity)
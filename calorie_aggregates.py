@@ -0,0 +1,158 @@
+import datetime
+
+import metrics
+
+# Offset between a date ordinal and the Julian day number SQLite understands
+JULIAN_OFFSET = 1721424.5
+
+# SQL expressions for the week and month bucket of a day ordinal.
+# Weeks start on Monday (ordinal 1 is Monday 0001-01-01); months are year * 12 + month - 1.
+WEEK_SQL = "(({day}) - 1) / 7"
+MONTH_SQL = ("CAST(strftime('%Y', ({day}) + {offset}) AS INTEGER) * 12"
+             " + CAST(strftime('%m', ({day}) + {offset}) AS INTEGER) - 1")
+
+PERIODS = {
+    "weekly": WEEK_SQL,
+    "monthly": MONTH_SQL,
+}
+
+CREATE_SQL = '''CREATE TABLE IF NOT EXISTS {table} (
+                username TEXT NOT NULL,
+                period INTEGER NOT NULL,
+                intake REAL NOT NULL,
+                expenditure REAL NOT NULL,
+                days INTEGER NOT NULL,
+                PRIMARY KEY (username, period)
+                ) WITHOUT ROWID'''
+
+# Add (sign = +1) or remove (sign = -1) one daily row from a summary table
+APPLY_SQL = '''INSERT INTO {table} (username, period, intake, expenditure, days)
+               VALUES ({row}.username, {period}, {sign} * {row}.intake, {sign} * {row}.expenditure, {sign})
+               ON CONFLICT (username, period) DO UPDATE
+               SET intake = intake + excluded.intake,
+                   expenditure = expenditure + excluded.expenditure,
+                   days = days + excluded.days;'''
+
+# Triggers keep the summaries in step with daily_log, one row at a time
+TRIGGERS = {
+    "insert": ("INSERT", (("NEW", 1),)),
+    "update": ("UPDATE", (("OLD", -1), ("NEW", 1))),
+    "delete": ("DELETE", (("OLD", -1),)),
+}
+
+REBUILD_SQL = '''INSERT INTO {table} (username, period, intake, expenditure, days)
+                 SELECT username, {period}, sum(intake), sum(expenditure), count(*)
+                 FROM daily_log GROUP BY username, {period}'''
+
+RANGE_SQL = '''SELECT group_concat(period), group_concat(intake), group_concat(expenditure), group_concat(days)
+               FROM (SELECT period, intake, expenditure, days FROM {table}
+                     WHERE username = ? AND period BETWEEN ? AND ? AND days > 0 ORDER BY period)'''
+
+
+def summary_table(period):
+    return "{}_summary".format(period)
+
+
+def period_sql(period, day):
+    return PERIODS[period].format(day=day, offset=JULIAN_OFFSET)
+
+
+# Create the weekly and monthly summary tables and the triggers that maintain them.
+# Summaries created over an existing daily_log are backfilled once.
+def create_tables(conn):
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    with conn:
+        for period in PERIODS:
+            table = summary_table(period)
+            conn.execute(CREATE_SQL.format(table=table))
+            if table not in existing:
+                conn.execute(REBUILD_SQL.format(table=table, period=period_sql(period, "day")))
+
+        for event, (action, rows) in TRIGGERS.items():
+            body = "\n".join(
+                APPLY_SQL.format(table=summary_table(period), row=row, sign=sign,
+                                 period=period_sql(period, "{}.day".format(row)))
+                for period in PERIODS for row, sign in rows
+            )
+            conn.execute("CREATE TRIGGER IF NOT EXISTS daily_log_summary_{} AFTER {} ON daily_log BEGIN\n{}\nEND"
+                         .format(event, action, body))
+
+
+# Recompute the summaries from scratch with a full scan of daily_log
+@metrics.timed("db.rebuild_summaries")
+def rebuild(conn):
+    with conn:
+        for period in PERIODS:
+            table = summary_table(period)
+            conn.execute("DELETE FROM {}".format(table))
+            conn.execute(REBUILD_SQL.format(table=table, period=period_sql(period, "day")))
+
+
+def week_of(date):
+    return (date.toordinal() - 1) // 7
+
+
+def month_of(date):
+    return date.year * 12 + date.month - 1
+
+
+# Read pre-rolled totals for a user between two dates (inclusive).
+# Returns (periods, intake, expenditure, days) as NumPy arrays.
+@metrics.timed("db.query_summary")
+def query_summary(conn, username, period, start, end):
+    import numpy as np
+    bucket = week_of if period == "weekly" else month_of
+    if isinstance(start, str):
+        start = datetime.date.fromisoformat(start)
+    if isinstance(end, str):
+        end = datetime.date.fromisoformat(end)
+    row = conn.execute(RANGE_SQL.format(table=summary_table(period)),
+                       (username, bucket(start), bucket(end))).fetchone()
+    if row[0] is None:
+        empty = np.empty(0)
+        return np.empty(0, dtype=np.int64), empty, empty, np.empty(0, dtype=np.int64)
+    periods, intake, expenditure, days = row
+    return (np.fromstring(periods, dtype=np.int64, sep=","),
+            np.fromstring(intake, sep=","),
+            np.fromstring(expenditure, sep=","),
+            np.fromstring(days, dtype=np.int64, sep=","))
+
+
+# Vectorized kernels for ad-hoc windows over a (possibly gappy) daily series
+
+# Spread values onto a dense day axis starting at days[0]; missing days get `fill`
+def densify(days, values, fill=0.0):
+    import numpy as np
+    if len(days) == 0:
+        return np.empty(0)
+    dense = np.full(int(days[-1] - days[0]) + 1, fill, dtype=np.float64)
+    dense[days - days[0]] = values
+    return dense
+
+
+# Sum of each trailing window of `window` days, via a cumulative sum
+def rolling_sum(values, window):
+    import numpy as np
+    totals = np.cumsum(values, dtype=np.float64)
+    totals[window:] = totals[window:] - totals[:-window]
+    return totals
+
+
+# Trailing moving average; the first window - 1 entries average what is available
+def moving_average(values, window):
+    import numpy as np
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return rolling_sum(values, window) / counts
+
+
+# Running total of intake minus expenditure
+def cumulative_balance(intake, expenditure):
+    import numpy as np
+    return np.cumsum(np.asarray(intake, dtype=np.float64) - expenditure)
+
+
+# Totals per bucket for arbitrary bucket ids (e.g. days // 14 for fortnights)
+def bucket_totals(buckets, values):
+    import numpy as np
+    keys, inverse = np.unique(buckets, return_inverse=True)
+    return keys, np.bincount(inverse, weights=values)
@@ -0,0 +1,307 @@
+import collections
+import hashlib
+import io
+import os
+
+import matplotlib
+import matplotlib.dates
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import numpy as np
+
+import calorie_aggregates
+import metrics
+
+PIE_SIZE = (6, 6)
+CALORIE_SIZE = (12, 8)
+BAR_WIDTH = 0.35
+
+# Level of detail for calorie charts. Up to DAILY_BARS days get a bar each;
+# longer ranges are averaged per week, or per month beyond WEEKLY_BARS weeks.
+# Line mode keeps at most LINE_POINTS points per series (LTTB downsampling).
+# Every bar is labelled only up to LABEL_BARS bars, otherwise just the
+# extremes, and at most MAX_TICKS dates are written on the x axis.
+DAILY_BARS = 90
+WEEKLY_BARS = 104
+LINE_POINTS = 500
+LABEL_BARS = 31
+MAX_TICKS = 8
+
+# Day ordinal of 1970-01-01, day 0 of datetime64[D]
+EPOCH_ORDINAL = 719163
+
+
+# Seaborn's whitegrid style as rc parameters, looked up once
+_style = None
+
+
+def chart_style():
+    global _style
+    if _style is None:
+        import seaborn as sns
+        _style = dict(sns.axes_style("whitegrid"))
+    return _style
+
+
+# Hash of everything a chart depends on, used as its cache key
+def content_key(kind, size, fmt, *data):
+    digest = hashlib.sha256()
+    digest.update("{}|{}|{}".format(kind, size, fmt).encode())
+    for item in data:
+        digest.update(np.ascontiguousarray(item).tobytes() if isinstance(item, np.ndarray) else repr(item).encode())
+        digest.update(b"|")
+    return digest.hexdigest()
+
+
+# Draw a goal progress pie chart onto an axes
+def draw_pie(ax, progress, target):
+    sizes = [progress, target - progress]
+    ax.pie(sizes, labels=['Progress Made', 'Remaining'], colors=['green', 'red'], autopct='%1.1f%%')
+    ax.set_title('Goal Progress')
+
+
+# Average daily values per week (weeks start on Monday) or calendar month.
+# Returns (period start dates as datetime64[D], intake, expenditure).
+def bin_days(days, intake, expenditure, period):
+    if period == "week":
+        keys = (days.astype(np.int64) + 3) // 7
+    else:
+        keys = days.astype("datetime64[M]").astype(np.int64)
+    keys, inverse = np.unique(keys, return_inverse=True)
+    counts = np.bincount(inverse)
+    if period == "week":
+        starts = (keys * 7 - 3).astype("datetime64[D]")
+    else:
+        starts = keys.astype("datetime64[M]").astype("datetime64[D]")
+    return (starts, np.bincount(inverse, weights=intake) / counts,
+            np.bincount(inverse, weights=expenditure) / counts)
+
+
+# The same averages for a user's log read from the weekly_summary or
+# monthly_summary table instead of rebinned from daily rows. The first and
+# last bins cover their whole week or month, even beyond start and end.
+def summary_bins(conn, username, start, end, period):
+    periods, intake, expenditure, days = calorie_aggregates.query_summary(conn, username, period + "ly", start, end)
+    if period == "week":
+        starts = (periods * 7 + 1 - EPOCH_ORDINAL).astype("datetime64[D]")
+    else:
+        starts = (periods - 1970 * 12).astype("datetime64[M]").astype("datetime64[D]")
+    return starts, intake / days, expenditure / days
+
+
+# Level of detail for a bar chart: (period, dates, intake, expenditure), where
+# period is None when every day keeps its own bar. With summary, a
+# (conn, username, start, end) tuple, weekly and monthly bins are read from
+# the summary tables.
+def calorie_bins(days, intake, expenditure, summary=None):
+    if len(days) <= DAILY_BARS:
+        return None, days, intake, expenditure
+    if summary is None:
+        period = "week" if len(np.unique((days.astype(np.int64) + 3) // 7)) <= WEEKLY_BARS else "month"
+        return (period,) + bin_days(days, intake, expenditure, period)
+    bins = summary_bins(*summary, "week")
+    if len(bins[0]) > WEEKLY_BARS:
+        return ("month",) + summary_bins(*summary, "month")
+    return ("week",) + bins
+
+
+# Largest-Triangle-Three-Buckets downsampling: indices of `threshold` points
+# that keep the visual shape of the (x, y) line
+def lttb(x, y, threshold):
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    chosen = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # The next bucket's average, or the last point for the final bucket
+        following = slice(end, edges[bucket + 2]) if bucket + 2 < len(edges) else slice(n - 1, n)
+        next_x, next_y = x[following].mean(), y[following].mean()
+        areas = np.abs((x[chosen] - next_x) * (y[start:end] - y[chosen])
+                       - (x[chosen] - x[start:end]) * (next_y - y[chosen]))
+        chosen = start + int(np.argmax(areas))
+        indices[bucket + 1] = chosen
+    return indices
+
+
+# Show at most MAX_TICKS of the given tick labels, evenly spaced
+def thin_ticks(ax, positions, labels):
+    step = max(-(-len(positions) // MAX_TICKS), 1)
+    ax.set_xticks(positions[::step])
+    ax.set_xticklabels(labels[::step])
+
+
+# Label only the highest and lowest bar of a series
+def label_extremes(ax, x, values):
+    if len(values) == 0:
+        return
+    for index in {int(np.argmax(values)), int(np.argmin(values))}:
+        ax.annotate('{:.0f}'.format(values[index]), xy=(x[index], values[index]), xytext=(0, 5),
+                    textcoords="offset points", ha='center', fontsize=10)
+
+
+# Draw calorie intake and expenditure onto an axes, as side-by-side bars or
+# (mode="line") two lines, reducing long ranges to a readable level of detail.
+# bins are bars already reduced by calorie_bins.
+def draw_calorie(ax, dates, intake, expenditure, mode="bar", bins=None):
+    days = np.asarray(dates, dtype="datetime64[D]")
+    intake = np.asarray(intake, dtype=np.float64)
+    expenditure = np.asarray(expenditure, dtype=np.float64)
+    if mode == "line":
+        draw_calorie_lines(ax, days, intake, expenditure)
+        return
+
+    period, days, intake, expenditure = bins or calorie_bins(days, intake, expenditure)
+
+    x = np.arange(len(days))
+    intake_bars = ax.bar(x, intake, width=BAR_WIDTH, label='Calorie Intake', color='#4caf50', alpha=0.8)
+    expenditure_bars = ax.bar(x + BAR_WIDTH, expenditure, width=BAR_WIDTH, label='Calorie Expenditure', color='#ff5722', alpha=0.8)
+
+    thin_ticks(ax, x + BAR_WIDTH / 2, [str(day)[:7] if period == "month" else str(day) for day in days])
+    ax.grid(True, linestyle='--', alpha=0.7)
+    ax.set_xlabel('Date', fontsize=12)
+    if period:
+        ax.set_ylabel('Calories per day', fontsize=12)
+        ax.set_title('Calorie Intake vs. Expenditure ({}ly averages)'.format(period), fontsize=16)
+    else:
+        ax.set_ylabel('Calories', fontsize=12)
+        ax.set_title('Calorie Intake vs. Expenditure', fontsize=16)
+    ax.legend(loc='best', fontsize=10)
+
+    if len(days) <= LABEL_BARS:
+        # Label every bar of a container in one call
+        ax.bar_label(intake_bars, fmt='%.0f', padding=5, fontsize=10)
+        ax.bar_label(expenditure_bars, fmt='%.0f', padding=5, fontsize=10)
+    else:
+        label_extremes(ax, x, intake)
+        label_extremes(ax, x + BAR_WIDTH, expenditure)
+
+
+def draw_calorie_lines(ax, days, intake, expenditure):
+    x = matplotlib.dates.date2num(days)
+    for values, label, color in ((intake, 'Calorie Intake', '#4caf50'), (expenditure, 'Calorie Expenditure', '#ff5722')):
+        keep = lttb(x, values, LINE_POINTS)
+        ax.plot(x[keep], values[keep], label=label, color=color, linewidth=1.5)
+        label_extremes(ax, x, values)
+    ax.xaxis_date()
+    ax.xaxis.set_major_locator(matplotlib.dates.AutoDateLocator(maxticks=MAX_TICKS))
+    ax.grid(True, linestyle='--', alpha=0.7)
+    ax.set_xlabel('Date', fontsize=12)
+    ax.set_ylabel('Calories', fontsize=12)
+    ax.set_title('Calorie Intake vs. Expenditure', fontsize=16)
+    ax.legend(loc='best', fontsize=10)
+
+
+# Headless (Agg) chart renderer.
+# One figure and axes is kept per chart size and cleared between renders, and
+# rendered images are cached by content so an unchanged chart is not redrawn.
+class ChartRenderer:
+    def __init__(self, fmt="png", dpi=100, cache_size=256, cache_dir=None):
+        self.fmt = fmt
+        self.dpi = dpi
+        self.cache_size = cache_size
+        self.cache_dir = cache_dir
+        self.cache = collections.OrderedDict()
+        self.figures = {}
+        self.hits = 0
+        self.misses = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _axes(self, size):
+        if size not in self.figures:
+            figure = Figure(figsize=size, dpi=self.dpi)
+            FigureCanvasAgg(figure)
+            self.figures[size] = (figure, figure.add_subplot())
+        figure, ax = self.figures[size]
+        ax.clear()
+        return figure, ax
+
+    def _cached(self, key, fmt):
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        if self.cache_dir:
+            path = os.path.join(self.cache_dir, "{}.{}".format(key, fmt))
+            if os.path.exists(path):
+                with open(path, "rb") as stream:
+                    return self._remember(key, stream.read())
+        return None
+
+    def _remember(self, key, image):
+        self.cache[key] = image
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return image
+
+    def _render(self, key, size, fmt, draw, *args):
+        image = self._cached(key, fmt)
+        if image is not None:
+            self.hits += 1
+            metrics.count("charts.cache_hits")
+            return image
+        self.misses += 1
+        metrics.count("charts.cache_misses")
+
+        with metrics.timer("charts.render." + draw.__name__), matplotlib.rc_context(chart_style()):
+            figure, ax = self._axes(size)
+            draw(ax, *args)
+            buffer = io.BytesIO()
+            figure.savefig(buffer, format=fmt)
+        image = buffer.getvalue()
+
+        if self.cache_dir:
+            with open(os.path.join(self.cache_dir, "{}.{}".format(key, fmt)), "wb") as stream:
+                stream.write(image)
+        return self._remember(key, image)
+
+    # Render a goal progress pie chart and return the image bytes
+    def pie_chart(self, progress, target, size=PIE_SIZE, fmt=None):
+        fmt = fmt or self.fmt
+        key = content_key("pie", size, fmt, progress, target)
+        return self._render(key, size, fmt, draw_pie, progress, target)
+
+    # Render a calorie intake vs. expenditure chart and return the image bytes.
+    # summary, a (conn, username, start, end) tuple naming where the data came
+    # from, lets long bar charts read their bins from the summary tables.
+    def calorie_chart(self, dates, intake, expenditure, size=CALORIE_SIZE, fmt=None, mode="bar", summary=None):
+        fmt = fmt or self.fmt
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        intake = np.asarray(intake, dtype=np.float64)
+        expenditure = np.asarray(expenditure, dtype=np.float64)
+        if summary is None or mode != "bar":
+            key = content_key("calorie", size, fmt, mode, dates, intake, expenditure)
+            return self._render(key, size, fmt, draw_calorie, dates, intake, expenditure, mode)
+        # The bins are what gets drawn, so they are what the cache key covers
+        bins = calorie_bins(dates, intake, expenditure, summary)
+        key = content_key("calorie", size, fmt, mode, *bins)
+        return self._render(key, size, fmt, draw_calorie, dates, intake, expenditure, mode, bins)
+
+
+# Image format implied by a file name, e.g. "svg" for chart.svg
+def format_for(path):
+    return os.path.splitext(path)[1].lstrip(".").lower() or "png"
+
+
+# Write rendered image bytes to a file
+def save(image, path):
+    with open(path, "wb") as stream:
+        stream.write(image)
+
+
+# Shared renderer for the application, created on first use
+_renderer = None
+
+
+def get_renderer():
+    global _renderer
+    if _renderer is None:
+        _renderer = ChartRenderer(fmt=os.environ.get("FITNESS_CHART_FORMAT", "png"),
+                                  cache_dir=os.environ.get("FITNESS_CHART_CACHE"))
+    return _renderer
@@ -0,0 +1,310 @@
+import argparse
+import datetime
+import json
+import sqlite3
+import sys
+
+import metrics
+from Fitness import DB_PATH
+
+GOAL_FIELDS = (("description", str, True), ("target", int, True), ("deadline", datetime.date.fromisoformat, True),
+               ("username", str, True), ("progress", int, False))
+PROGRESS_FIELDS = (("id", int, True), ("amount", int, True))
+LOG_FIELDS = (("username", str, True), ("date", datetime.date.fromisoformat, True), ("intake", float, True),
+              ("expenditure", float, True))
+BMI_FIELDS = (("weight", float, True), ("height_cm", float, True), ("age", int, True))
+PLAN_FIELDS = (("goal", str, True), ("weight", float, False), ("height_cm", float, False), ("age", int, False))
+
+
+# JSON true/false, or the strings "true"/"false" as given on a command line
+def to_bool(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    raise ValueError("expected true or false")
+
+
+REPORT_FIELDS = (("out", str, False), ("workers", int, False), ("days", int, False),
+                 ("end", datetime.date.fromisoformat, False), ("full", to_bool, False))
+
+
+# Raised for input that cannot be applied; nothing from its batch is written
+class CommandError(Exception):
+    pass
+
+
+# Check and convert every record before any of them is applied
+def parse(records, fields):
+    if not isinstance(records, list):
+        raise CommandError("records must be a JSON array")
+    parsed = []
+    for number, record in enumerate(records, start=1):
+        if not isinstance(record, dict):
+            raise CommandError("record {}: expected a JSON object".format(number))
+        values = {}
+        for name, convert, required in fields:
+            value = record.get(name)
+            if value is None:
+                if required:
+                    raise CommandError("record {}: {} is required".format(number, name))
+                continue
+            try:
+                values[name] = convert(value)
+            except (TypeError, ValueError):
+                raise CommandError("record {}: invalid {}: {!r}".format(number, name, value))
+        parsed.append(values)
+    return parsed
+
+
+def meal_to_json(meal):
+    return {"slot": meal.slot, "description": meal.description, "calories": meal.calories}
+
+
+# Runs commands against one database connection. Each call applies all of
+# its records in a single transaction, and modules, the meal planner and the
+# connection stay loaded between calls.
+class BatchSession:
+    def __init__(self, db_path=DB_PATH):
+        import repository
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        # Same journaling as repository.Database, so each small commit stays cheap
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        repository.create_schema(self.conn)
+        self._planner = None
+        self.commands = {
+            "goals add": self.goals_add,
+            "goals progress": self.goals_progress,
+            "log add": self.log_add,
+            "bmi": self.bmi,
+            "plan": self.plan,
+            "report": self.report,
+        }
+
+    def run(self, command, records):
+        handler = self.commands.get(command)
+        if handler is None:
+            raise CommandError("unknown command: {}".format(command))
+        with metrics.timer("cli." + command.replace(" ", "_")):
+            return handler(records)
+
+    @property
+    def planner(self):
+        if self._planner is None:
+            import meal_planner
+            self._planner = meal_planner.MealPlanner()
+        return self._planner
+
+    # Returns the new goal ids
+    def goals_add(self, records):
+        import repository
+        goals = parse(records, GOAL_FIELDS)
+        with self.conn:
+            return [{"id": self.conn.execute(repository.INSERT_GOAL_SQL, (
+                goal["description"], goal["target"], goal["deadline"].isoformat(), goal.get("progress", 0),
+                goal["username"])).lastrowid} for goal in goals]
+
+    # Adds to goals' progress through the event log; returns their new totals
+    def goals_progress(self, records):
+        import progress_events
+        updates = parse(records, PROGRESS_FIELDS)
+        results = []
+        with self.conn:
+            for update in updates:
+                progress = progress_events.add_progress(self.conn, update["id"], update["amount"])
+                if progress is None:
+                    raise CommandError("no such goal: {}".format(update["id"]))
+                results.append({"id": update["id"], "progress": progress})
+        return results
+
+    # Inserts or replaces daily calorie entries; returns how many were written
+    def log_add(self, records):
+        import daily_log
+        entries = parse(records, LOG_FIELDS)
+        with self.conn:
+            self.conn.executemany(daily_log.UPSERT_SQL, [
+                (entry["username"], entry["date"].toordinal(), entry["intake"], entry["expenditure"])
+                for entry in entries])
+        return [{"entries": len(entries)}]
+
+    def bmi(self, records):
+        import body_metrics
+        results = []
+        for person in parse(records, BMI_FIELDS):
+            try:
+                bmi = body_metrics.compute_bmi(person["weight"], person["height_cm"])
+            except ZeroDivisionError:
+                raise CommandError("height_cm must be positive")
+            results.append({
+                "bmi": round(bmi, 2),
+                "category": body_metrics.bmi_category(bmi),
+                "bmr": round(body_metrics.basal_metabolic_rate(person["weight"], person["height_cm"], person["age"])),
+                "tdee": round(body_metrics.total_daily_energy(person["weight"], person["height_cm"], person["age"])),
+            })
+        return results
+
+    # The catalog plan for a goal, or a week built around the person's calorie
+    # target when weight, height_cm and age are given
+    def plan(self, records):
+        import diet_catalog
+        import meal_planner
+        catalog = diet_catalog.load_catalog()
+        results = []
+        for request in parse(records, PLAN_FIELDS):
+            goal = request["goal"]
+            if goal not in catalog.titles:
+                raise CommandError("unknown diet goal: {}".format(goal))
+            if "weight" in request:
+                if "height_cm" not in request or "age" not in request:
+                    raise CommandError("weight, height_cm and age are required together")
+                target = meal_planner.calorie_target(request["weight"], request["height_cm"], request["age"], goal)
+                week = self.planner.plan_week(target)
+                results.append({"goal": goal, "target": target, "within_tolerance": week.within_tolerance, "days": [
+                    {"day": number, "meals": [meal_to_json(meal) for meal in meals]}
+                    for number, meals in enumerate(week.days, start=1)]})
+            else:
+                days = sorted(day for plan_goal, day in catalog.days if plan_goal == goal)
+                results.append({"goal": goal, "title": catalog.titles[goal], "days": [
+                    {"day": day, "meals": [meal_to_json(meal) for meal in catalog.day_plan(goal, day)]}
+                    for day in days]})
+        return results
+
+    # Render the chart report; takes a single options record
+    def report(self, records):
+        import report
+        results = []
+        for options in parse(records, REPORT_FIELDS):
+            rendered, skipped, failed = report.generate(
+                self.db_path, options.get("out", "reports"), options.get("workers"), options.get("days", 90),
+                options.get("end"), full=options.get("full", False))
+            results.append({"rendered": rendered, "skipped": skipped, "failed": failed})
+        return results
+
+    def close(self):
+        self.conn.close()
+
+
+def read_jsonl(stream):
+    records = []
+    for number, line in enumerate(stream, start=1):
+        if line.strip():
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                raise CommandError("line {}: invalid JSON".format(number))
+    return records
+
+
+def write_jsonl(stream, results):
+    stream.write("".join(json.dumps(result) + "\n" for result in results))
+
+
+# Long-running mode: one JSON command per input line, e.g.
+#   {"command": "goals add", "description": "Run 100 km", "target": 100, ...}
+#   {"command": "log add", "records": [{...}, {...}]}
+# Each gets one response line: {"ok": true, "result": ...} or {"ok": false, "error": ...}.
+# A command's "records" are applied together in one transaction. A command that
+# fails for any reason gets an error response; the loop carries on.
+def serve_stdin(session, stdin=sys.stdin, stdout=sys.stdout):
+    for line in stdin:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise CommandError("expected a JSON object")
+            command = request.pop("command", None)
+            if "records" in request:
+                response = {"ok": True, "result": session.run(command, request["records"])}
+            else:
+                response = {"ok": True, "result": session.run(command, [request])[0]}
+        except json.JSONDecodeError:
+            response = {"ok": False, "error": "invalid JSON"}
+        except (CommandError, sqlite3.Error) as e:
+            response = {"ok": False, "error": str(e)}
+        except Exception as e:
+            response = {"ok": False, "error": "{}: {}".format(type(e).__name__, e)}
+        stdout.write(json.dumps(response) + "\n")
+        stdout.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scriptable Fitness Tracker commands. Results are printed as JSON lines.")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    parser.add_argument("--serve-stdin", action="store_true",
+                        help="read JSON commands from stdin, one per line, and answer each on stdout")
+    subcommands = parser.add_subparsers(dest="command")
+
+    def batch_option(command):
+        command.add_argument("--batch", action="store_true",
+                             help="read JSONL records from stdin and apply them in one transaction")
+
+    goals = subcommands.add_parser("goals", help="add goals or record progress").add_subparsers(dest="action", required=True)
+    goals_add = goals.add_parser("add", help="add a goal")
+    goals_add.add_argument("--description")
+    goals_add.add_argument("--target", type=int)
+    goals_add.add_argument("--deadline", help="YYYY-MM-DD")
+    goals_add.add_argument("--username")
+    batch_option(goals_add)
+    goals_progress = goals.add_parser("progress", help="add to a goal's progress")
+    goals_progress.add_argument("id", nargs="?", type=int)
+    goals_progress.add_argument("amount", nargs="?", type=int)
+    batch_option(goals_progress)
+
+    log = subcommands.add_parser("log", help="record daily calories").add_subparsers(dest="action", required=True)
+    log_add = log.add_parser("add", help="insert or replace a day's calorie intake and expenditure")
+    log_add.add_argument("--username")
+    log_add.add_argument("--date", help="YYYY-MM-DD")
+    log_add.add_argument("--intake", type=float)
+    log_add.add_argument("--expenditure", type=float)
+    batch_option(log_add)
+
+    bmi = subcommands.add_parser("bmi", help="BMI, category, BMR and TDEE")
+    bmi.add_argument("--weight", type=float, help="kg")
+    bmi.add_argument("--height-cm", type=float)
+    bmi.add_argument("--age", type=int)
+    batch_option(bmi)
+
+    plan = subcommands.add_parser("plan", help="7-day diet plan for a goal")
+    plan.add_argument("goal", nargs="?", help="weight_gain, weight_loss, maintenance or muscle_gain")
+    plan.add_argument("--weight", type=float, help="kg; with --height-cm and --age, plan around the calorie target")
+    plan.add_argument("--height-cm", type=float)
+    plan.add_argument("--age", type=int)
+    batch_option(plan)
+
+    report = subcommands.add_parser("report", help="render every user's charts and an HTML summary")
+    report.add_argument("--out")
+    report.add_argument("--workers", type=int)
+    report.add_argument("--days", type=int)
+    report.add_argument("--end", help="YYYY-MM-DD")
+    report.add_argument("--full", action="store_true", default=None)
+
+    args = parser.parse_args(argv)
+    if not args.serve_stdin and args.command is None:
+        parser.error("a command or --serve-stdin is required")
+
+    session = BatchSession(args.db)
+    try:
+        if args.serve_stdin:
+            serve_stdin(session)
+            return 0
+        command = " ".join(filter(None, (args.command, getattr(args, "action", None))))
+        if getattr(args, "batch", False):
+            records = read_jsonl(sys.stdin)
+        else:
+            # The command's own options form a single record
+            records = [{name: value for name, value in vars(args).items()
+                        if value is not None and name not in ("db", "serve_stdin", "command", "action", "batch")}]
+        write_jsonl(sys.stdout, session.run(command, records))
+        return 0
+    except (CommandError, sqlite3.Error) as e:
+        print("error: {}".format(e), file=sys.stderr)
+        return 1
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
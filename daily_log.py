@@ -0,0 +1,75 @@
+import collections
+import datetime
+
+import metrics
+
+# Day ordinal of 1970-01-01, used to turn ordinals into datetime64 values
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+# Daily calorie entries keyed by (username, day), where day is a date ordinal.
+# WITHOUT ROWID stores the rows in primary key order, so the key doubles as a
+# covering index and a date-range scan for one user reads contiguous pages.
+CREATE_SQL = '''CREATE TABLE IF NOT EXISTS daily_log (
+                username TEXT NOT NULL,
+                day INTEGER NOT NULL,
+                intake REAL NOT NULL,
+                expenditure REAL NOT NULL,
+                PRIMARY KEY (username, day)
+                ) WITHOUT ROWID'''
+
+UPSERT_SQL = '''INSERT INTO daily_log (username, day, intake, expenditure) VALUES (?, ?, ?, ?)
+                ON CONFLICT (username, day) DO UPDATE
+                SET intake = excluded.intake, expenditure = excluded.expenditure'''
+
+# Each column is concatenated inside SQLite and parsed straight into an array,
+# so no per-row Python tuples are built for a range query.
+RANGE_SQL = '''SELECT group_concat(day), group_concat(intake), group_concat(expenditure)
+               FROM (SELECT day, intake, expenditure FROM daily_log
+                     WHERE username = ? AND day BETWEEN ? AND ? ORDER BY day)'''
+
+# Columnar slice of a user's daily log: parallel NumPy arrays
+CalorieSeries = collections.namedtuple("CalorieSeries", ["days", "intake", "expenditure"])
+
+
+def create_table(conn):
+    conn.execute(CREATE_SQL)
+
+
+def to_ordinal(date):
+    if isinstance(date, str):
+        date = datetime.date.fromisoformat(date)
+    return date.toordinal()
+
+
+# Insert or replace the entry for one user and date
+@metrics.timed("db.upsert_day")
+def upsert_day(conn, username, date, intake, expenditure):
+    with conn:
+        conn.execute(UPSERT_SQL, (username, to_ordinal(date), intake, expenditure))
+
+
+# Insert or replace many (date, intake, expenditure) entries in one transaction
+@metrics.timed("db.upsert_days")
+def upsert_days(conn, username, entries):
+    rows = ((username, to_ordinal(date), intake, expenditure) for date, intake, expenditure in entries)
+    with conn:
+        conn.executemany(UPSERT_SQL, rows)
+
+
+# Return the entries between start and end (inclusive) as a CalorieSeries
+@metrics.timed("db.query_range")
+def query_range(conn, username, start, end):
+    import numpy as np
+    days, intake, expenditure = conn.execute(RANGE_SQL, (username, to_ordinal(start), to_ordinal(end))).fetchone()
+    if days is None:
+        return CalorieSeries(np.empty(0, dtype=np.int64), np.empty(0), np.empty(0))
+    return CalorieSeries(
+        np.fromstring(days, dtype=np.int64, sep=","),
+        np.fromstring(intake, sep=","),
+        np.fromstring(expenditure, sep=","),
+    )
+
+
+# Convert day ordinals from a CalorieSeries into datetime64[D] values
+def as_dates(days):
+    return (days - EPOCH_ORDINAL).astype("datetime64[D]")
@@ -0,0 +1,120 @@
+import bisect
+import collections
+import json
+import os
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "diet_plans.json")
+
+# Menu choices in suggest_diet_plan, mapped to goal types in the catalog
+GOAL_CHOICES = {
+    "1": "weight_gain",
+    "2": "weight_loss",
+    "3": "maintenance",
+    "4": "muscle_gain",
+}
+
+# Meal slots in the order they are shown; "workout" carries no calories
+SLOTS = ("breakfast", "mid_morning_snack", "lunch", "afternoon_snack", "dinner", "workout")
+
+Meal = collections.namedtuple("Meal", ["goal", "day", "slot", "description", "calories"])
+
+
+# Read-only diet plan catalog, indexed once when it is built.
+# Exact lookups are dictionary hits; calorie range queries bisect sorted lists.
+class DietCatalog:
+    def __init__(self, plans):
+        self.titles = {}
+        self.meals = {}
+        self.days = {}
+        self.day_totals = {}
+        self._by_calories = {}
+        self._by_day_total = {}
+        self._rendered = {}
+
+        for goal, plan in plans.items():
+            self.titles[goal] = plan["title"]
+            for entry in plan["days"]:
+                day = entry["day"]
+                meals = tuple(Meal(goal, day, meal["slot"], meal["description"], meal["calories"])
+                              for meal in entry["meals"])
+                self.days[(goal, day)] = meals
+                self.day_totals[(goal, day)] = sum(meal.calories or 0 for meal in meals)
+                for meal in meals:
+                    self.meals[(goal, day, meal.slot)] = meal
+
+        # Calorie-sorted meals per goal, and per (goal, slot)
+        groups = collections.defaultdict(list)
+        for meal in self.meals.values():
+            if meal.calories is not None:
+                groups[(meal.goal, None)].append(meal)
+                groups[(meal.goal, meal.slot)].append(meal)
+        for key, meals in groups.items():
+            meals.sort(key=lambda meal: meal.calories)
+            self._by_calories[key] = ([meal.calories for meal in meals], meals)
+
+        # Days per goal sorted by their total calories
+        for goal in self.titles:
+            totals = sorted((total, day) for (plan_goal, day), total in self.day_totals.items() if plan_goal == goal)
+            self._by_day_total[goal] = ([total for total, _ in totals], [day for _, day in totals])
+
+    def goals(self):
+        return list(self.titles)
+
+    def meal(self, goal, day, slot):
+        return self.meals.get((goal, day, slot))
+
+    def day_plan(self, goal, day):
+        return self.days.get((goal, day), ())
+
+    # Meals with low <= calories <= high, optionally for one slot only
+    def meals_in_range(self, goal, low, high, slot=None):
+        calories, meals = self._by_calories.get((goal, slot), ([], []))
+        return meals[bisect.bisect_left(calories, low):bisect.bisect_right(calories, high)]
+
+    # Day numbers whose total calories are below max_total
+    def days_under(self, goal, max_total):
+        totals, days = self._by_day_total.get(goal, ([], []))
+        return days[:bisect.bisect_left(totals, max_total)]
+
+    # The whole plan for a goal as preformatted text, built once per goal
+    def render(self, goal):
+        if goal not in self._rendered:
+            days = sorted(day for plan_goal, day in self.days if plan_goal == goal)
+            self._rendered[goal] = format_days((day, self.days[(goal, day)]) for day in days)
+        return self._rendered[goal]
+
+
+# Format (day number, meals) pairs the way suggest_diet_plan shows a plan
+def format_days(days):
+    lines = []
+    for day, meals in days:
+        lines.append("Day {}:".format(day))
+        for meal in meals:
+            lines.append("    {}:".format(meal.slot.capitalize()))
+            lines.append("        {}".format(describe(meal)))
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+# Meal description with its calories, as shown in the diet plan
+def describe(meal):
+    if meal.calories is None:
+        return meal.description
+    return "{} (Approx. {} calories)".format(meal.description, meal.calories)
+
+
+# Read a catalog from a JSON file
+def read_catalog(path):
+    with open(path, encoding="utf-8") as stream:
+        return DietCatalog(json.load(stream))
+
+
+# The bundled catalog is loaded from disk once per process
+_catalog = None
+
+
+def load_catalog():
+    global _catalog
+    if _catalog is None:
+        _catalog = read_catalog(CATALOG_PATH)
+    return _catalog
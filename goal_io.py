@@ -0,0 +1,222 @@
+import argparse
+import contextlib
+import csv
+import datetime
+import itertools
+import json
+import operator
+import os
+import sqlite3
+import sys
+
+import metrics
+from Fitness import DB_PATH
+
+# Columns read from and written to goal files, in table order
+COLUMNS = ("description", "target", "deadline", "progress", "username")
+
+INSERT_SQL = "INSERT INTO goals (description, target, deadline, progress, username) VALUES (?, ?, ?, ?, ?)"
+SELECT_SQL = "SELECT description, target, deadline, progress, username FROM goals"
+
+CHUNK_SIZE = 10000
+
+# Input files at least this large are imported with the goal indexes dropped
+# and rebuilt afterwards; smaller ones update the indexes as they go
+REBUILD_INDEXES_BYTES = 1 << 20
+
+
+# Guess the file format from its extension
+def detect_format(path):
+    if path.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    return "csv"
+
+
+# Read records from a CSV file with a header row, one dict at a time
+def read_csv(stream):
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    header = [name.strip() for name in header]
+    for line in reader:
+        if line:
+            yield dict(zip(header, line))
+
+
+# Read a CSV file with a header row as tuples in COLUMNS order, for
+# import_goals(..., parse=parse_row). Missing columns and fields read as None.
+# Cheaper than read_csv for large imports, since no dict is built per row.
+def read_csv_rows(stream):
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    header = [name.strip() for name in header]
+    positions = [header.index(name) if name in header else len(header) for name in COLUMNS]
+    pick = operator.itemgetter(*positions)
+    width = max(positions) + 1
+    for line in reader:
+        if len(line) >= width:
+            yield pick(line)
+        elif line:
+            yield pick(line + [None] * (width - len(line)))
+
+
+# Read records from a JSONL file, one dict at a time.
+# Malformed lines are passed on as None so the importer counts them as rejected.
+def read_jsonl(stream):
+    for line in stream:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+
+# Validate one record and turn it into a row for the goals table
+def parse_record(record):
+    return parse_row((record["description"], record["target"], record["deadline"], record.get("progress"),
+                      record["username"]))
+
+
+# Validate a tuple of values in COLUMNS order and turn it into a row
+def parse_row(values):
+    description, target, deadline, progress, username = values
+    if not description or not username:
+        raise ValueError("description and username are required")
+    # date.fromisoformat validates the deadline; only other ISO forms
+    # (e.g. 20300101) need normalising to YYYY-MM-DD
+    deadline = str(deadline).strip()
+    date = datetime.date.fromisoformat(deadline)
+    if len(deadline) != 10 or deadline[4] != "-" or deadline[7] != "-":
+        deadline = date.isoformat()
+    return description, int(target), deadline, int(progress or 0), username
+
+
+# Stream records into the goals table, one transaction per chunk.
+# Invalid records are skipped; returns (imported, rejected) counts.
+# `parse` turns each record into a row: parse_record for dicts, parse_row for
+# tuples from read_csv_rows. With rebuild_indexes, the goal indexes are
+# dropped for the import and rebuilt once at the end (also if it fails part way).
+def import_goals(conn, records, chunk_size=CHUNK_SIZE, rebuild_indexes=False, parse=parse_record):
+    if not rebuild_indexes:
+        return _import_chunks(conn, records, chunk_size, parse)
+    import repository
+    repository.drop_goal_indexes(conn)
+    try:
+        return _import_chunks(conn, records, chunk_size, parse)
+    finally:
+        with metrics.timer("db.rebuild_goal_indexes"), conn:
+            repository.create_goal_indexes(conn)
+
+
+def _import_chunks(conn, records, chunk_size, parse):
+    imported = 0
+    rejected = 0
+    records = iter(records)
+    while True:
+        batch = list(itertools.islice(records, chunk_size))
+        if not batch:
+            break
+        rows = []
+        for record in batch:
+            try:
+                rows.append(parse(record))
+            except (KeyError, TypeError, ValueError):
+                rejected += 1
+        with metrics.timer("db.import_chunk"), conn:
+            conn.executemany(INSERT_SQL, rows)
+        imported += len(rows)
+    return imported, rejected
+
+
+# Stream rows out of the goals table with fetchmany, one dict at a time
+def export_goals(conn, username=None, chunk_size=CHUNK_SIZE):
+    cursor = conn.cursor()
+    if username is None:
+        cursor.execute(SELECT_SQL + " ORDER BY id")
+    else:
+        cursor.execute(SELECT_SQL + " WHERE username = ? ORDER BY id", (username,))
+    while True:
+        with metrics.timer("db.export_fetch"):
+            rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        for row in rows:
+            yield dict(zip(COLUMNS, row))
+
+
+def write_csv(stream, records):
+    writer = csv.writer(stream)
+    writer.writerow(COLUMNS)
+    count = 0
+    for record in records:
+        writer.writerow([record[name] for name in COLUMNS])
+        count += 1
+    return count
+
+
+def write_jsonl(stream, records):
+    count = 0
+    for record in records:
+        stream.write(json.dumps(record))
+        stream.write("\n")
+        count += 1
+    return count
+
+
+def _open(path, mode):
+    if path == "-":
+        return contextlib.nullcontext(sys.stdin if "r" in mode else sys.stdout)
+    return open(path, mode, newline="", encoding="utf-8")
+
+
+# Command line entry point for bulk goal import and export
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import and export of fitness goals")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subcommands.add_parser("import", help="load goals from a CSV or JSONL file")
+    import_parser.add_argument("path", help="input file, or - for stdin")
+    import_parser.add_argument("--format", choices=("csv", "jsonl"))
+    import_parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    export_parser = subcommands.add_parser("export", help="write goals to a CSV or JSONL file")
+    export_parser.add_argument("path", help="output file, or - for stdout")
+    export_parser.add_argument("--format", choices=("csv", "jsonl"))
+    export_parser.add_argument("--username")
+    export_parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    args = parser.parse_args(argv)
+    fmt = args.format or detect_format(args.path)
+    import repository
+    conn = sqlite3.connect(args.db)
+
+    try:
+        repository.create_schema(conn)
+        if args.command == "import":
+            # Same journaling as repository.Database, so each chunk's commit stays cheap
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            rebuild = args.path != "-" and os.path.getsize(args.path) >= REBUILD_INDEXES_BYTES
+            with _open(args.path, "r") as stream:
+                if fmt == "jsonl":
+                    records, parse = read_jsonl(stream), parse_record
+                else:
+                    records, parse = read_csv_rows(stream), parse_row
+                imported, rejected = import_goals(conn, records, args.chunk_size, rebuild, parse)
+            print("Imported {} goals ({} rejected).".format(imported, rejected), file=sys.stderr)
+        else:
+            with _open(args.path, "w") as stream:
+                writer = write_jsonl if fmt == "jsonl" else write_csv
+                count = writer(stream, export_goals(conn, args.username, args.chunk_size))
+            print("Exported {} goals.".format(count), file=sys.stderr)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import datetime
+import sys
+
+# SQLite converts the ISO deadline to a day ordinal while reading, so Python
+# never parses date strings during hydration.
+LOAD_SQL = ("SELECT id, description, target, CAST(julianday(deadline) - 1721424.5 AS INTEGER), progress, username"
+            " FROM goals")
+
+# "Today" as a day ordinal, shared by every CompactGoal.
+# Refreshed by load_goals and refresh_today rather than on each call.
+_today = datetime.date.today().toordinal()
+
+
+def refresh_today(today=None):
+    global _today
+    _today = (today or datetime.date.today()).toordinal()
+    return _today
+
+
+# Memory-compact goal with the same behaviour as Fitness.Goal.
+# The deadline is kept as a day ordinal and days_remaining() compares it with
+# the cached ordinal for today.
+class CompactGoal:
+    __slots__ = ("id", "description", "target", "deadline", "progress", "username")
+
+    def __init__(self, id, description, target, deadline, progress, username):
+        self.id = id
+        self.description = description
+        self.target = target
+        self.deadline = deadline
+        self.progress = progress
+        self.username = username
+
+    @property
+    def deadline_date(self):
+        return datetime.date.fromordinal(self.deadline)
+
+    def update_progress(self, amount):
+        self.progress += amount
+
+    def is_complete(self):
+        return self.progress >= self.target
+
+    def days_remaining(self):
+        return self.deadline - _today
+
+    def __repr__(self):
+        return "CompactGoal({!r}, {!r}, {!r}, {}, {!r}, {!r})".format(
+            self.id, self.description, self.target, self.deadline_date, self.progress, self.username)
+
+
+# Hydrate goals from one query, optionally for a single user.
+# Descriptions and usernames repeat across goals, so they are interned and
+# each distinct string is stored once.
+def load_goals(conn, username=None, today=None):
+    refresh_today(today)
+    if username is None:
+        cursor = conn.execute(LOAD_SQL + " ORDER BY id")
+    else:
+        cursor = conn.execute(LOAD_SQL + " WHERE username = ? ORDER BY id", (username,))
+    intern = sys.intern
+    return [CompactGoal(goal_id, intern(description), target, deadline, progress, intern(owner))
+            for goal_id, description, target, deadline, progress, owner in cursor]
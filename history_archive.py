@@ -0,0 +1,235 @@
+import argparse
+import datetime
+import json
+import os
+import shutil
+import sqlite3
+
+import numpy as np
+
+import daily_log
+import metrics
+import progress_events
+from Fitness import DB_PATH
+
+VERSION = 1
+
+# Entries newer than this many days stay "hot" and are left out of the archive
+HOT_DAYS = 90
+
+CALORIE_COLUMNS = {"day": np.int32, "intake": np.float32, "expenditure": np.float32}
+PROGRESS_COLUMNS = {"ts": np.int64, "amount": np.int32}
+
+# Columnar archive of cold calorie and progress history, one directory:
+#   meta.json                        format version and cutoff day
+#   calories/users.json              usernames; user i owns rows offsets[i]:offsets[i + 1]
+#   calories/offsets.npy             int64 row offsets, one more than there are users
+#   calories/{day,intake,expenditure}.npy
+#                                    one fixed-width column per file, rows sorted by
+#                                    user then day; day is a date ordinal
+#   progress/goals.npy               sorted goal ids, with offsets.npy as above
+#   progress/{ts,amount}.npy         events sorted by goal then time
+# Columns are opened memory-mapped, so reads touch only the pages they need
+# and return views into the files rather than copies.
+
+
+def _create_columns(directory, columns, rows):
+    os.makedirs(directory)
+    return {name: np.lib.format.open_memmap(os.path.join(directory, name + ".npy"), mode="w+",
+                                            dtype=dtype, shape=(rows,))
+            for name, dtype in columns.items()}
+
+
+def _finish_columns(columns):
+    for column in columns.values():
+        column.flush()
+
+
+@metrics.timed("db.archive_calories")
+def _export_calories(conn, directory, cutoff):
+    users = [username for (username,) in
+             conn.execute("SELECT DISTINCT username FROM daily_log WHERE day < ? ORDER BY username", (cutoff,))]
+    rows = conn.execute("SELECT count(*) FROM daily_log WHERE day < ?", (cutoff,)).fetchone()[0]
+    columns = _create_columns(directory, CALORIE_COLUMNS, rows)
+    offsets = np.zeros(len(users) + 1, dtype=np.int64)
+    first, last = datetime.date.min, datetime.date.fromordinal(cutoff - 1)
+
+    # One columnar range query per user, copied straight into the memory maps
+    row = 0
+    for index, username in enumerate(users):
+        series = daily_log.query_range(conn, username, first, last)
+        end = row + len(series.days)
+        columns["day"][row:end] = series.days
+        columns["intake"][row:end] = series.intake
+        columns["expenditure"][row:end] = series.expenditure
+        offsets[index + 1] = row = end
+
+    _finish_columns(columns)
+    np.save(os.path.join(directory, "offsets.npy"), offsets)
+    with open(os.path.join(directory, "users.json"), "w", encoding="utf-8") as stream:
+        json.dump(users, stream)
+    return rows
+
+
+@metrics.timed("db.archive_progress")
+def _export_progress(conn, directory, cutoff_ts):
+    goal_ids = np.array([goal_id for (goal_id,) in
+                         conn.execute("SELECT DISTINCT goal_id FROM progress_events WHERE ts < ? ORDER BY goal_id",
+                                      (cutoff_ts,))], dtype=np.int64)
+    rows = conn.execute("SELECT count(*) FROM progress_events WHERE ts < ?", (cutoff_ts,)).fetchone()[0]
+    columns = _create_columns(directory, PROGRESS_COLUMNS, rows)
+    offsets = np.zeros(len(goal_ids) + 1, dtype=np.int64)
+
+    row = 0
+    for index, goal_id in enumerate(goal_ids.tolist()):
+        ts, amount = progress_events.event_series(conn, goal_id, 0, cutoff_ts - 1)
+        end = row + len(ts)
+        columns["ts"][row:end] = ts
+        columns["amount"][row:end] = amount
+        offsets[index + 1] = row = end
+
+    _finish_columns(columns)
+    np.save(os.path.join(directory, "offsets.npy"), offsets)
+    np.save(os.path.join(directory, "goals.npy"), goal_ids)
+    return rows
+
+
+# Write every calorie entry and progress event from before `before` (default:
+# HOT_DAYS ago) to an archive at `path`, replacing any archive already there.
+# SQLite keeps its rows; the archive is a read-optimised copy of the history.
+# Everything is read in one transaction, so the archive is a consistent
+# snapshot even while others write; the connection must not have a
+# transaction open. If the export fails, the staging directory is removed and
+# any existing archive is left as it was. Returns (calorie rows, progress events)
+# written.
+@metrics.timed("archive.export")
+def export(conn, path, before=None):
+    if conn.in_transaction:
+        raise ValueError("export needs a connection with no open transaction")
+    before = before or datetime.date.today() - datetime.timedelta(days=HOT_DAYS)
+    cutoff = before.toordinal()
+    staging = path + ".tmp"
+    old = path + ".old"
+    # Left over from an interrupted run
+    shutil.rmtree(staging, ignore_errors=True)
+    shutil.rmtree(old, ignore_errors=True)
+
+    try:
+        os.makedirs(staging)
+        conn.execute("BEGIN")
+        try:
+            calorie_rows = _export_calories(conn, os.path.join(staging, "calories"), cutoff)
+            event_rows = _export_progress(conn, os.path.join(staging, "progress"),
+                                          (cutoff - progress_events.EPOCH_ORDINAL) * progress_events.SECONDS_PER_DAY)
+        finally:
+            conn.rollback()
+        with open(os.path.join(staging, "meta.json"), "w", encoding="utf-8") as stream:
+            json.dump({"version": VERSION, "cutoff": before.isoformat(),
+                       "calorie_rows": calorie_rows, "progress_rows": event_rows}, stream)
+
+        # Swap the new archive in, so readers never see a half-written one
+        if os.path.exists(path):
+            os.rename(path, old)
+        try:
+            os.rename(staging, path)
+        except OSError:
+            # Put the previous archive back
+            if os.path.exists(old):
+                os.rename(old, path)
+            raise
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    shutil.rmtree(old, ignore_errors=True)
+    return calorie_rows, event_rows
+
+
+def _load(directory, name):
+    return np.load(os.path.join(directory, name + ".npy"), mmap_mode="r")
+
+
+# Read-only view of an archive. Lookups return NumPy views of the memory-mapped
+# columns (no rows are copied), so they can go straight to analytics or charts.
+class HistoryArchive:
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as stream:
+            meta = json.load(stream)
+        if meta["version"] != VERSION:
+            raise ValueError("Unsupported archive version: {}".format(meta["version"]))
+        self.cutoff = datetime.date.fromisoformat(meta["cutoff"])
+
+        calories = os.path.join(path, "calories")
+        with open(os.path.join(calories, "users.json"), encoding="utf-8") as stream:
+            self.users = json.load(stream)
+        self.user_index = {username: index for index, username in enumerate(self.users)}
+        self.user_offsets = _load(calories, "offsets")
+        self.days, self.intake, self.expenditure = (_load(calories, name) for name in CALORIE_COLUMNS)
+
+        progress = os.path.join(path, "progress")
+        self.goal_ids = _load(progress, "goals")
+        self.goal_offsets = _load(progress, "offsets")
+        self.ts, self.amount = (_load(progress, name) for name in PROGRESS_COLUMNS)
+
+    # A user's entries between start and end (inclusive) as a CalorieSeries of views
+    def calories(self, username, start=None, end=None):
+        index = self.user_index.get(username)
+        if index is None:
+            return daily_log.CalorieSeries(self.days[:0], self.intake[:0], self.expenditure[:0])
+        low, high = int(self.user_offsets[index]), int(self.user_offsets[index + 1])
+        days = self.days[low:high]
+        first = 0 if start is None else int(np.searchsorted(days, daily_log.to_ordinal(start)))
+        last = len(days) if end is None else int(np.searchsorted(days, daily_log.to_ordinal(end), side="right"))
+        return daily_log.CalorieSeries(days[first:last], self.intake[low + first:low + last],
+                                       self.expenditure[low + first:low + last])
+
+    # A goal's events between two Unix times (inclusive) as (ts, amount) views
+    def progress(self, goal_id, start=None, end=None):
+        index = int(np.searchsorted(self.goal_ids, goal_id))
+        if index == len(self.goal_ids) or self.goal_ids[index] != goal_id:
+            return self.ts[:0], self.amount[:0]
+        low, high = int(self.goal_offsets[index]), int(self.goal_offsets[index + 1])
+        ts = self.ts[low:high]
+        first = 0 if start is None else int(np.searchsorted(ts, start))
+        last = len(ts) if end is None else int(np.searchsorted(ts, end, side="right"))
+        return ts[first:last], self.amount[low + first:low + last]
+
+    # Total (intake, expenditure) per user, in the order of self.users
+    def calorie_totals(self):
+        starts = self.user_offsets[:-1]
+        if len(self.days) == 0:
+            return np.zeros(len(starts)), np.zeros(len(starts))
+        return (np.add.reduceat(self.intake, starts, dtype=np.float64),
+                np.add.reduceat(self.expenditure, starts, dtype=np.float64))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Columnar archive of calorie and progress history")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subcommands.add_parser("export", help="write history before a date to an archive")
+    export_parser.add_argument("path", help="archive directory")
+    export_parser.add_argument("--before", type=datetime.date.fromisoformat,
+                               help="first day not archived (default: {} days ago)".format(HOT_DAYS))
+
+    info_parser = subcommands.add_parser("info", help="describe an archive")
+    info_parser.add_argument("path", help="archive directory")
+
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        import repository
+        conn = sqlite3.connect(args.db)
+        try:
+            repository.create_schema(conn)
+            calorie_rows, event_rows = export(conn, args.path, args.before)
+        finally:
+            conn.close()
+        print("Archived {} calorie entries and {} progress events.".format(calorie_rows, event_rows))
+    else:
+        archive = HistoryArchive(args.path)
+        print("History before {}: {} users, {} calorie entries, {} goals, {} progress events.".format(
+            archive.cutoff, len(archive.users), len(archive.days), len(archive.goal_ids), len(archive.ts)))
+
+
+if __name__ == "__main__":
+    main()
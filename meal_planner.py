@@ -0,0 +1,134 @@
+import bisect
+import collections
+
+import body_metrics
+import diet_catalog
+import metrics
+
+# Calorie-bearing slots a generated day fills, in order
+MEAL_SLOTS = tuple(slot for slot in diet_catalog.SLOTS if slot != "workout")
+
+# Daily calorie adjustment per diet goal, on top of maintenance calories
+GOAL_ADJUSTMENTS = {
+    "weight_gain": 500,
+    "weight_loss": -500,
+    "maintenance": 0,
+    "muscle_gain": 300,
+}
+
+# Moderately active (exercise 3-5 days a week)
+ACTIVITY_FACTOR = body_metrics.ACTIVITY_FACTORS["moderate"]
+
+DEFAULT_TOLERANCE = 100
+
+# A generated week. within_tolerance is False when the target is outside
+# what the catalog's meals can add up to; the nearest reachable total is used.
+WeekPlan = collections.namedtuple("WeekPlan", ["target", "days", "totals", "within_tolerance"])
+
+
+# Daily calorie target for the inputs calculate_bmi collects
+def calorie_target(weight, height_cm, age, goal="maintenance", activity=ACTIVITY_FACTOR):
+    return round(body_metrics.basal_metabolic_rate(weight, height_cm, age) * activity + GOAL_ADJUSTMENTS[goal])
+
+
+# Builds 7-day plans from the catalog meals that hit a daily calorie target.
+# Each day is a depth-first search over the slots, pruned by the set of totals
+# the remaining slots can still reach (computed once per planner). Meals are
+# not repeated within a week unless no other combination fits, and finished
+# weeks are memoized by (target rounded to 10 kcal, tolerance).
+class MealPlanner:
+    def __init__(self, catalog=None, days=7):
+        catalog = catalog or diet_catalog.load_catalog()
+        self.days = days
+
+        # Distinct meals per slot, in a fixed order so plans are reproducible
+        self.options = []
+        for slot in MEAL_SLOTS:
+            meals = {}
+            for meal in catalog.meals.values():
+                if meal.slot == slot and meal.calories is not None:
+                    meals.setdefault(meal.description, meal)
+            self.options.append([meals[description] for description in sorted(meals)])
+
+        # suffix_sums[i]: sorted totals reachable with one meal from each slot i..end
+        self.suffix_sums = [[0]]
+        for options in reversed(self.options):
+            calories = {meal.calories for meal in options}
+            sums = {total + value for total in self.suffix_sums[0] for value in calories}
+            self.suffix_sums.insert(0, sorted(sums))
+
+        self._weeks = {}
+
+    def _reachable(self, slot, low, high):
+        sums = self.suffix_sums[slot]
+        index = bisect.bisect_left(sums, low)
+        return index < len(sums) and sums[index] <= high
+
+    def _search(self, slot, low, high, used, start, chosen):
+        if slot == len(self.options):
+            return low <= 0 <= high
+        options = self.options[slot]
+        for i in range(len(options)):
+            meal = options[(start + i) % len(options)]
+            if meal.description in used or any(meal.description == other.description for other in chosen):
+                continue
+            if not self._reachable(slot + 1, low - meal.calories, high - meal.calories):
+                continue
+            chosen.append(meal)
+            if self._search(slot + 1, low - meal.calories, high - meal.calories, used, start, chosen):
+                return True
+            chosen.pop()
+        return False
+
+    # Pick one meal per slot with a total in [low, high], avoiding `used` if possible
+    def plan_day(self, low, high, used=frozenset(), day=0):
+        start = day * 3
+        for avoid in (used, frozenset()):
+            chosen = []
+            if self._search(0, low, high, avoid, start, chosen):
+                return tuple(chosen)
+        return None
+
+    @metrics.timed("plans.week")
+    def plan_week(self, target, tolerance=DEFAULT_TOLERANCE):
+        key = (int(round(target, -1)), tolerance)
+        if key not in self._weeks:
+            self._weeks[key] = self._plan_week(*key)
+        return self._weeks[key]
+
+    def _plan_week(self, target, tolerance):
+        low, high = target - tolerance, target + tolerance
+        within = self._reachable(0, low, high)
+        if not within:
+            # Aim for the closest total the meals can reach
+            sums = self.suffix_sums[0]
+            index = bisect.bisect_left(sums, target)
+            low = high = min(sums[max(index - 1, 0):index + 1], key=lambda total: abs(total - target))
+
+        days = []
+        used = set()
+        for day in range(self.days):
+            meals = self.plan_day(low, high, used, day)
+            days.append(meals)
+            used.update(meal.description for meal in meals)
+        totals = tuple(sum(meal.calories for meal in meals) for meals in days)
+        return WeekPlan(target, tuple(days), totals, within)
+
+
+# Generate plans for many people at once.
+# `people` yields (weight, height_cm, age, goal) tuples; one planner (and its
+# memoized weeks) is shared across the whole batch.
+def plan_batch(people, tolerance=DEFAULT_TOLERANCE, planner=None):
+    planner = planner or MealPlanner()
+    return [planner.plan_week(calorie_target(weight, height_cm, age, goal), tolerance)
+            for weight, height_cm, age, goal in people]
+
+
+# Format a generated week like suggest_diet_plan, with the goal's workouts
+def render_week(plan, goal=None, catalog=None):
+    catalog = catalog or diet_catalog.load_catalog()
+    days = []
+    for number, meals in enumerate(plan.days, start=1):
+        workout = catalog.meal(goal, number, "workout") if goal else None
+        days.append((number, meals + ((workout,) if workout else ())))
+    return diet_catalog.format_days(days)
@@ -0,0 +1,265 @@
+import atexit
+import bisect
+import collections
+import os
+import sys
+import threading
+import time
+
+# Instrumentation switches, read once at import:
+#   FITNESS_METRICS=path      record timings and counters and write them to
+#                             path at exit (Prometheus text for .prom/.txt,
+#                             JSON otherwise)
+#   FITNESS_PROFILE=path      profile the whole run and write the result to path
+#   FITNESS_PROFILE_MODE      "cprofile" (default; pstats file) or "sample"
+#                             (folded stacks, one sample every
+#                             FITNESS_PROFILE_INTERVAL_MS, default 5)
+# With FITNESS_METRICS unset, timed() returns the function unchanged and
+# timer() a shared no-op context, so instrumented code runs as before.
+# Names are grouped by prefix: db.* for database calls (db.events.* for the
+# progress event log), charts.*, plans.*, auth.*, cli.*, report.* and archive.*.
+METRICS_PATH = os.environ.get("FITNESS_METRICS")
+PROFILE_PATH = os.environ.get("FITNESS_PROFILE")
+PROFILE_MODE = os.environ.get("FITNESS_PROFILE_MODE", "cprofile")
+PROFILE_INTERVAL_MS = float(os.environ.get("FITNESS_PROFILE_INTERVAL_MS", 5))
+
+ENABLED = bool(METRICS_PATH)
+
+
+# Latency histogram with fixed, roughly logarithmic bucket bounds in milliseconds
+class LatencyHistogram:
+    BOUNDS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, millis):
+        self.counts[bisect.bisect_left(self.BOUNDS, millis)] += 1
+        self.count += 1
+        self.total += millis
+
+    # Upper bound of the bucket holding the given quantile
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.BOUNDS + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count if self.count else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p90_ms": self.quantile(0.9),
+            "p99_ms": self.quantile(0.99),
+            "buckets": dict(zip([str(bound) for bound in self.BOUNDS] + ["+Inf"], self.counts)),
+        }
+
+
+# Named latency histograms and counters, safe to update from any thread
+class Registry:
+    def __init__(self):
+        self.histograms = {}
+        self.counters = collections.Counter()
+        self.lock = threading.Lock()
+
+    def observe(self, name, millis):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+            histogram.observe(millis)
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {name: histogram.summary() for name, histogram in self.histograms.items()},
+            }
+
+    # Prometheus text exposition format; histograms are in milliseconds
+    def to_prometheus(self):
+        lines = []
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                metric = "fitness_{}_total".format(_metric_name(name))
+                lines.append("# TYPE {} counter".format(metric))
+                lines.append("{} {}".format(metric, value))
+            for name, histogram in sorted(self.histograms.items()):
+                metric = "fitness_{}_milliseconds".format(_metric_name(name))
+                lines.append("# TYPE {} histogram".format(metric))
+                seen = 0
+                for bound, count in zip(histogram.BOUNDS + ("+Inf",), histogram.counts):
+                    seen += count
+                    lines.append('{}_bucket{{le="{}"}} {}'.format(metric, bound, seen))
+                lines.append("{}_sum {}".format(metric, histogram.total))
+                lines.append("{}_count {}".format(metric, histogram.count))
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        if os.path.splitext(path)[1] in (".prom", ".txt"):
+            text = self.to_prometheus()
+        else:
+            import json
+            text = json.dumps(self.snapshot(), indent=2)
+        with open(path, "w", encoding="utf-8") as stream:
+            stream.write(text)
+
+
+def _metric_name(name):
+    return "".join(char if char.isalnum() else "_" for char in name)
+
+
+registry = Registry()
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        registry.observe(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+# Context manager recording how long its block takes under `name`
+def timer(name):
+    return _Timer(name) if ENABLED else _NULL_TIMER
+
+
+# Decorator recording each call's duration under `name`
+def timed(name):
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                registry.observe(name, (time.perf_counter() - start) * 1000)
+
+        wrapper.__name__ = func.__name__
+        wrapper.__qualname__ = func.__qualname__
+        wrapper.__wrapped__ = func
+        return wrapper
+    return decorate
+
+
+# Start/stop pair for spans that do not fit in a with block
+def start():
+    return time.perf_counter() if ENABLED else None
+
+
+def stop(name, started):
+    if started is not None:
+        registry.observe(name, (time.perf_counter() - started) * 1000)
+
+
+# Record a duration measured elsewhere, e.g. in a worker process
+def observe(name, millis):
+    if ENABLED:
+        registry.observe(name, millis)
+
+
+def count(name, amount=1):
+    if ENABLED:
+        registry.count(name, amount)
+
+
+# Profiling
+
+# Samples every thread's stack at a fixed interval and writes them in the
+# folded format flame graph tools read ("frame;frame;frame count" per line).
+class SamplingProfiler:
+    def __init__(self, interval_ms=PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.stacks = collections.Counter()
+        self.running = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self.running.set()
+        self.thread.start()
+
+    def stop(self):
+        self.running.clear()
+        self.thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while self.running.is_set():
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append("{}:{}".format(os.path.basename(code.co_filename), code.co_name))
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as stream:
+            for stack, samples in self.stacks.most_common():
+                stream.write("{} {}\n".format(stack, samples))
+
+
+# Start profiling this process; the result is written to `path` at exit
+def start_profiling(path, mode=PROFILE_MODE):
+    if mode == "sample":
+        profiler = SamplingProfiler()
+        profiler.start()
+
+        def finish():
+            profiler.stop()
+            profiler.dump(path)
+    elif mode == "cprofile":
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+        def finish():
+            profiler.disable()
+            profiler.dump_stats(path)
+    else:
+        raise ValueError("Unknown profile mode: {}".format(mode))
+    atexit.register(finish)
+    return profiler
+
+
+if METRICS_PATH:
+    atexit.register(registry.dump, METRICS_PATH)
+
+if PROFILE_PATH:
+    start_profiling(PROFILE_PATH)
@@ -0,0 +1,218 @@
+import datetime
+import time
+
+import metrics
+
+SECONDS_PER_DAY = 86400
+
+# Day ordinal of 1970-01-01, to turn Unix days into date ordinals
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+# Append-only progress history, the one record of progress changes. ts is Unix
+# time in seconds. goals.progress is set when a goal is created and afterwards
+# only by compact(), which adds new events to it; it is a snapshot of the log.
+# The (goal_id, ts) index also carries amount, so per-goal time-series queries
+# read only the index.
+CREATE_SQL = (
+    '''CREATE TABLE IF NOT EXISTS progress_events (
+       id INTEGER PRIMARY KEY,
+       goal_id INTEGER NOT NULL,
+       ts INTEGER NOT NULL,
+       amount INTEGER NOT NULL
+       )''',
+    "CREATE INDEX IF NOT EXISTS progress_events_goal_ts ON progress_events (goal_id, ts, amount)",
+    # Highest event id already folded into goals.progress
+    '''CREATE TABLE IF NOT EXISTS progress_event_state (
+       name TEXT PRIMARY KEY,
+       value INTEGER NOT NULL
+       )''',
+)
+
+INSERT_SQL = "INSERT INTO progress_events (goal_id, ts, amount) VALUES (?, ?, ?)"
+ADD_SQL = "UPDATE goals SET progress = coalesce(progress, 0) + ? WHERE id = ?"
+# Inserts nothing if the goal does not exist
+INSERT_FOR_GOAL_SQL = "INSERT INTO progress_events (goal_id, ts, amount) SELECT id, ?, ? FROM goals WHERE id = ?"
+
+COMPACTED_ID_SQL = "coalesce((SELECT value FROM progress_event_state WHERE name = 'compacted_id'), 0)"
+COMPACT_SQL = '''UPDATE goals SET progress = coalesce(progress, 0) + pending.total
+                 FROM (SELECT goal_id, sum(amount) AS total FROM progress_events
+                       WHERE id > {} GROUP BY goal_id) AS pending
+                 WHERE goals.id = pending.goal_id'''.format(COMPACTED_ID_SQL)
+
+SERIES_SQL = '''SELECT group_concat(ts), group_concat(amount)
+                FROM (SELECT ts, amount FROM progress_events
+                      WHERE goal_id = ? AND ts BETWEEN ? AND ? ORDER BY ts)'''
+
+
+def create_tables(conn):
+    for sql in CREATE_SQL:
+        conn.execute(sql)
+    conn.commit()
+
+
+def compacted_id(conn):
+    row = conn.execute("SELECT value FROM progress_event_state WHERE name = 'compacted_id'").fetchone()
+    return row[0] if row else 0
+
+
+# Fold every event since the last compaction into goals.progress, in the
+# caller's transaction. The UPDATE runs first, so the write lock is held
+# before the compacted id is read and no other writer can interleave.
+# Returns the number of events folded.
+@metrics.timed("db.events.compact")
+def compact(conn):
+    conn.execute(COMPACT_SQL)
+    start = compacted_id(conn)
+    end = conn.execute("SELECT coalesce(max(id), 0) FROM progress_events").fetchone()[0]
+    if end <= start:
+        return 0
+    _set_compacted_id(conn, end)
+    return end - start
+
+
+def _set_compacted_id(conn, value):
+    conn.execute("INSERT INTO progress_event_state (name, value) VALUES ('compacted_id', ?)"
+                 " ON CONFLICT (name) DO UPDATE SET value = excluded.value", (value,))
+
+
+# Append events that are compacted as they are written: their totals are added
+# to goals.progress directly, which is much cheaper than folding them back out
+# of the log, in the caller's transaction. Events other writers left
+# uncompacted are folded first, so the watermark stays exact.
+@metrics.timed("db.events.append")
+def append_compacted(conn, events):
+    totals = {}
+    for goal_id, _, amount in events:
+        totals[goal_id] = totals.get(goal_id, 0) + amount
+    # Takes the write lock before the watermark is read
+    conn.executemany(ADD_SQL, [(amount, goal_id) for goal_id, amount in totals.items()])
+    if conn.execute("SELECT coalesce(max(id), 0) FROM progress_events").fetchone()[0] > compacted_id(conn):
+        compact(conn)
+    conn.executemany(INSERT_SQL, events)
+    _set_compacted_id(conn, conn.execute("SELECT coalesce(max(id), 0) FROM progress_events").fetchone()[0])
+
+
+# Record one progress change and compact it straight away, in the caller's
+# transaction. Returns the goal's new progress, or None if there is no such goal.
+@metrics.timed("db.events.add_progress")
+def add_progress(conn, goal_id, amount, ts=None):
+    if conn.execute(INSERT_FOR_GOAL_SQL, (int(time.time() if ts is None else ts), amount, goal_id)).rowcount == 0:
+        return None
+    compact(conn)
+    return conn.execute("SELECT progress FROM goals WHERE id = ?", (goal_id,)).fetchone()[0]
+
+
+# Buffers progress events and appends them in batches, for bulk loads.
+# Until compact() runs, goals.progress lags the log; current_progress() adds
+# the events not yet compacted.
+class ProgressEventLog:
+    def __init__(self, conn, max_events=1000, max_delay_ms=1000):
+        self.conn = conn
+        self.max_events = max_events
+        self.max_delay = max_delay_ms / 1000
+        self.pending = []
+        self.oldest = None
+        create_tables(conn)
+
+    def record(self, goal_id, amount, ts=None):
+        now = time.time()
+        self.pending.append((goal_id, int(now if ts is None else ts), amount))
+        if self.oldest is None:
+            self.oldest = now
+        if len(self.pending) >= self.max_events or now - self.oldest >= self.max_delay:
+            self.flush()
+
+    @metrics.timed("db.events.flush")
+    def flush(self):
+        if not self.pending:
+            return 0
+        with self.conn:
+            self.conn.executemany(INSERT_SQL, self.pending)
+        count = len(self.pending)
+        self.pending = []
+        self.oldest = None
+        return count
+
+    def compact(self):
+        self.flush()
+        with self.conn:
+            return compact(self.conn)
+
+
+# Current progress: the compacted value plus any events not yet compacted
+@metrics.timed("db.events.current_progress")
+def current_progress(conn, goal_id):
+    row = conn.execute("SELECT coalesce(progress, 0) FROM goals WHERE id = ?", (goal_id,)).fetchone()
+    if row is None:
+        return None
+    pending = conn.execute("SELECT coalesce(sum(amount), 0) FROM progress_events WHERE goal_id = ? AND id > ?",
+                           (goal_id, compacted_id(conn))).fetchone()[0]
+    return row[0] + pending
+
+
+# A goal's events between two Unix times as (ts, amount) NumPy arrays
+@metrics.timed("db.events.series")
+def event_series(conn, goal_id, start=0, end=2 ** 62):
+    import numpy as np
+    ts, amount = conn.execute(SERIES_SQL, (goal_id, int(start), int(end))).fetchone()
+    if ts is None:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.fromstring(ts, dtype=np.int64, sep=","), np.fromstring(amount, dtype=np.int64, sep=",")
+
+
+# Progress per calendar day (UTC) as (day ordinals, totals), with no gaps
+def daily_pace(conn, goal_id, start=0, end=2 ** 62):
+    import numpy as np
+    ts, amount = event_series(conn, goal_id, start, end)
+    if len(ts) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    days = ts // SECONDS_PER_DAY
+    totals = np.bincount(days - days[0], weights=amount).astype(np.int64)
+    return np.arange(days[0], days[-1] + 1) + EPOCH_ORDINAL, totals
+
+
+# Progress a goal was created with: its compacted progress less the events
+# already folded into it
+@metrics.timed("db.events.initial_progress")
+def initial_progress(conn, goal_id):
+    row = conn.execute("SELECT coalesce(progress, 0) FROM goals WHERE id = ?", (goal_id,)).fetchone()
+    if row is None:
+        return None
+    folded = conn.execute("SELECT coalesce(sum(amount), 0) FROM progress_events WHERE goal_id = ? AND id <= ?",
+                          (goal_id, compacted_id(conn))).fetchone()[0]
+    return row[0] - folded
+
+
+# Remaining work per day: target minus cumulative progress, counting the
+# progress the goal was created with
+def burndown(conn, goal_id):
+    import numpy as np
+    target = conn.execute("SELECT target FROM goals WHERE id = ?", (goal_id,)).fetchone()
+    days, totals = daily_pace(conn, goal_id)
+    if target is None:
+        return days, totals
+    return days, target[0] - initial_progress(conn, goal_id) - np.cumsum(totals)
+
+
+# Projected completion date from the average daily pace over the last
+# `window` days. Returns (date or None, on track for the deadline).
+@metrics.timed("db.events.projected_completion")
+def projected_completion(conn, goal_id, window=14, today=None):
+    import numpy as np
+    row = conn.execute("SELECT target, deadline FROM goals WHERE id = ?", (goal_id,)).fetchone()
+    if row is None:
+        return None, False
+    target, deadline = row
+    deadline = datetime.date.fromisoformat(deadline)
+    today = today or datetime.date.today()
+    remaining = target - current_progress(conn, goal_id)
+    if remaining <= 0:
+        return today, True
+
+    start = (today.toordinal() - window + 1 - EPOCH_ORDINAL) * SECONDS_PER_DAY
+    _, amount = event_series(conn, goal_id, start)
+    pace = amount.sum() / window
+    if pace <= 0:
+        return None, False
+    projected = today + datetime.timedelta(days=int(np.ceil(remaining / pace)))
+    return projected, projected <= deadline
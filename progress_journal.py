@@ -0,0 +1,66 @@
+import atexit
+import time
+
+import metrics
+
+# Durability modes for the progress journal
+SYNC = "sync"        # write and commit every update straight away
+BATCHED = "batched"  # merge updates in memory and commit them together
+WAL = "wal"          # batched, with WAL journaling and synchronous=NORMAL
+MODES = (SYNC, BATCHED, WAL)
+
+
+# Write-behind journal for goal progress updates.
+# Each update is a change in progress (never an absolute value). Updates are
+# merged in memory per goal and second, so a burst of increments becomes one
+# progress event. The events are appended to the progress event log and added
+# to goals.progress in one transaction after `max_events` updates,
+# once `max_delay_ms` has passed since the oldest pending update, on flush()
+# and at exit.
+# The delay is only checked when record() is called, so callers must flush()
+# when they stop recording (e.g. leaving a tracking session); until then other
+# connections see the previous progress.
+class ProgressJournal:
+    def __init__(self, conn, mode=BATCHED, max_events=2000, max_delay_ms=1000):
+        if mode not in MODES:
+            raise ValueError("Unknown durability mode: {}".format(mode))
+        self.conn = conn
+        self.mode = mode
+        self.max_events = max_events
+        self.max_delay = max_delay_ms / 1000
+        self.pending = {}
+        self.events = 0
+        self.oldest = None
+
+        if mode == WAL:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+
+        atexit.register(self.flush)
+
+    # Record that a goal's progress changed by `amount`
+    def record(self, goal_id, amount):
+        key = (goal_id, int(time.time()))
+        self.pending[key] = self.pending.get(key, 0) + amount
+        self.events += 1
+        now = time.monotonic()
+        if self.oldest is None:
+            self.oldest = now
+
+        if (self.mode == SYNC or self.events >= self.max_events
+                or now - self.oldest >= self.max_delay):
+            self.flush()
+
+    def flush(self):
+        # Append all pending events and compact them in a single transaction
+        if not self.pending:
+            return 0
+        import progress_events
+        rows = [(goal_id, ts, amount) for (goal_id, ts), amount in self.pending.items() if amount]
+        with metrics.timer("db.journal_flush"), self.conn:
+            progress_events.append_compacted(self.conn, rows)
+        metrics.count("db.journal_rows", len(rows))
+        self.pending.clear()
+        self.events = 0
+        self.oldest = None
+        return len(rows)
@@ -0,0 +1,213 @@
+import argparse
+import datetime
+import heapq
+import itertools
+import json
+import logging
+import sqlite3
+import time
+
+import metrics
+from Fitness import DB_PATH
+
+# Days before the deadline at which reminders fire; 0 is the deadline day
+# itself and -1 the day after, when the goal is overdue.
+DEFAULT_LEAD_DAYS = (7, 1, 0, -1)
+
+DEADLINE_SQL = "CAST(julianday(deadline) - 1721424.5 AS INTEGER)"
+LOAD_SQL = ("SELECT id, {} FROM goals"
+            " WHERE deadline IS NOT NULL AND coalesce(progress, 0) < target").format(DEADLINE_SQL)
+# Goals added after `id`, and goals with progress events after `event id`; both
+# are primary key ranges. The last column is 1 for a goal still in progress.
+REFRESH_SQL = ("SELECT id, {}, deadline IS NOT NULL AND coalesce(progress, 0) < target FROM goals"
+               " WHERE id > ? OR id IN (SELECT goal_id FROM progress_events WHERE id > ?)").format(DEADLINE_SQL)
+
+logger = logging.getLogger("fitness.reminders")
+
+
+# Min-heap of upcoming reminders keyed by the day they fire.
+# Only the next reminder of each goal is on the heap, so it holds one entry
+# per goal. Removing or rescheduling a goal bumps its version and the old heap
+# entry is skipped when it surfaces, keeping every operation O(log n).
+class DeadlineScheduler:
+    def __init__(self, lead_days=DEFAULT_LEAD_DAYS, callbacks=()):
+        self.lead_days = tuple(sorted(set(lead_days), reverse=True))
+        self.callbacks = list(callbacks)
+        self.heap = []
+        self.goals = {}
+        self.versions = itertools.count()
+        # Highest goal and progress event ids seen, for refresh()
+        self.last_goal_id = 0
+        self.last_event_id = 0
+
+    def __len__(self):
+        return len(self.goals)
+
+    # Add a goal, or move it to a new deadline (a date or day ordinal)
+    def add(self, goal_id, deadline, today=None):
+        if isinstance(deadline, datetime.date):
+            deadline = deadline.toordinal()
+        today = _ordinal(today)
+        version = next(self.versions)
+        self.goals[goal_id] = (deadline, version)
+        if not self._push(goal_id, deadline, version, today):
+            del self.goals[goal_id]
+
+    # Stop reminding about a goal (completed or deleted)
+    def remove(self, goal_id):
+        self.goals.pop(goal_id, None)
+
+    complete = remove
+
+    # Load every unfinished goal with a single query
+    @metrics.timed("db.reminders_load")
+    def load(self, conn, today=None):
+        today = _ordinal(today)
+        self._read_positions(conn)
+        for goal_id, deadline in conn.execute(LOAD_SQL):
+            lead = self._next_lead(deadline, today)
+            if lead is not None:
+                version = next(self.versions)
+                self.goals[goal_id] = (deadline, version)
+                self.heap.append((deadline - lead, version, goal_id, lead))
+        heapq.heapify(self.heap)
+
+    # Pick up goals added, completed or reopened since load() or the last
+    # refresh(); returns how many goals changed
+    @metrics.timed("db.reminders_refresh")
+    def refresh(self, conn, today=None):
+        last_goal_id, last_event_id = self.last_goal_id, self.last_event_id
+        self._read_positions(conn)
+        changed = 0
+        for goal_id, deadline, active in conn.execute(REFRESH_SQL, (last_goal_id, last_event_id)):
+            current = self.goals.get(goal_id)
+            if not active:
+                if current is not None:
+                    self.complete(goal_id)
+                    changed += 1
+            elif current is None or current[0] != deadline:
+                self.add(goal_id, deadline, today)
+                changed += 1
+        return changed
+
+    def _read_positions(self, conn):
+        # Read before the goals themselves, so rows written in between are seen again next time
+        self.last_goal_id = conn.execute("SELECT coalesce(max(id), 0) FROM goals").fetchone()[0]
+        self.last_event_id = conn.execute("SELECT coalesce(max(id), 0) FROM progress_events").fetchone()[0]
+
+    def _next_lead(self, deadline, today):
+        # Largest lead time whose reminder day has not passed yet
+        for lead in self.lead_days:
+            if deadline - lead >= today:
+                return lead
+        return None
+
+    # Schedule a goal's next reminder after `after`; False if it has none left
+    def _push(self, goal_id, deadline, version, after):
+        lead = self._next_lead(deadline, after)
+        if lead is None:
+            return False
+        heapq.heappush(self.heap, (deadline - lead, version, goal_id, lead))
+        return True
+
+    # Day ordinal of the next reminder, or None
+    def next_due(self):
+        while self.heap:
+            fire, version, goal_id, _ = self.heap[0]
+            if self.goals.get(goal_id, (None, None))[1] == version:
+                return fire
+            heapq.heappop(self.heap)
+        return None
+
+    # Fire every reminder due on or before `today`; returns how many fired
+    def run_due(self, today=None):
+        today = _ordinal(today)
+        fired = 0
+        while self.heap and self.heap[0][0] <= today:
+            fire, version, goal_id, lead = heapq.heappop(self.heap)
+            current = self.goals.get(goal_id)
+            if current is None or current[1] != version:
+                continue
+            deadline = current[0]
+            for callback in self.callbacks:
+                callback(goal_id, datetime.date.fromordinal(deadline), lead)
+            fired += 1
+            if not self._push(goal_id, deadline, version, fire + 1):
+                del self.goals[goal_id]
+        return fired
+
+
+def _ordinal(day):
+    if day is None:
+        return datetime.date.today().toordinal()
+    if isinstance(day, datetime.date):
+        return day.toordinal()
+    return day
+
+
+def describe(goal_id, deadline, lead):
+    if lead > 0:
+        return "Goal {} is due in {} day(s), on {}.".format(goal_id, lead, deadline)
+    if lead == 0:
+        return "Goal {} is due today ({}).".format(goal_id, deadline)
+    return "Goal {} is overdue: its deadline was {}.".format(goal_id, deadline)
+
+
+# Callbacks
+
+def print_reminder(goal_id, deadline, lead):
+    print(describe(goal_id, deadline, lead))
+
+
+def log_reminder(goal_id, deadline, lead):
+    logger.info(describe(goal_id, deadline, lead))
+
+
+# Stand-in for a webhook: appends the JSON payload it would POST to a file
+class WebhookStub:
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, goal_id, deadline, lead):
+        payload = {"goal_id": goal_id, "deadline": deadline.isoformat(), "lead_days": lead,
+                   "message": describe(goal_id, deadline, lead)}
+        with open(self.path, "a", encoding="utf-8") as stream:
+            stream.write(json.dumps(payload) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send reminders for approaching and passed goal deadlines")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    parser.add_argument("--lead-days", default=",".join(map(str, DEFAULT_LEAD_DAYS)),
+                        help="comma-separated days before the deadline to remind at")
+    parser.add_argument("--webhook-file", help="append JSON payloads to this file as a webhook stand-in")
+    parser.add_argument("--once", action="store_true", help="fire what is due today and exit")
+    parser.add_argument("--poll-seconds", type=float, default=60,
+                        help="how often to check for new and completed goals")
+    args = parser.parse_args(argv)
+
+    callbacks = [print_reminder]
+    if args.webhook_file:
+        callbacks.append(WebhookStub(args.webhook_file))
+    scheduler = DeadlineScheduler([int(day) for day in args.lead_days.split(",")], callbacks)
+
+    import repository
+    conn = sqlite3.connect(args.db)
+    try:
+        repository.create_schema(conn)
+        scheduler.load(conn)
+        while True:
+            scheduler.run_due()
+            if args.once:
+                break
+            # Sleep until the next day starts, when reminders can next fire, or
+            # until the next check for goals that were added or finished
+            tomorrow = datetime.datetime.combine(datetime.date.today() + datetime.timedelta(days=1), datetime.time())
+            time.sleep(max(min((tomorrow - datetime.datetime.now()).total_seconds(), args.poll_seconds), 1))
+            scheduler.refresh(conn)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
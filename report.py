@@ -0,0 +1,235 @@
+import argparse
+import datetime
+import hashlib
+import html
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+import urllib.parse
+
+import metrics
+from Fitness import DB_PATH
+
+# Bump when the charts change, so the next run redraws every user
+RENDER_VERSION = 1
+
+MANIFEST = "manifest.json"
+INDEX = "index.html"
+
+USERS_SQL = '''SELECT username FROM users
+               UNION SELECT username FROM goals WHERE username IS NOT NULL
+               UNION SELECT username FROM daily_log'''
+
+# Everything a user's charts depend on, gathered for all users in two scans
+GOAL_STATE_SQL = '''SELECT username, group_concat(id || ':' || coalesce(progress, 0) || ':' || target
+                                                  || ':' || deadline || ':' || description, '|')
+                    FROM (SELECT * FROM goals ORDER BY username, id) GROUP BY username'''
+LOG_STATE_SQL = '''SELECT username, count(*), total(day), total(intake), total(expenditure),
+                          total(day * intake), total(day * expenditure)
+                   FROM daily_log WHERE day BETWEEN ? AND ? GROUP BY username'''
+
+USER_GOALS_SQL = "SELECT id, description, target, deadline, progress FROM goals WHERE username = ? ORDER BY id"
+
+
+# Per-user fingerprints; a user whose fingerprint matches the last run is skipped.
+# The window only enters through the log state, so moving it past days a user
+# never logged does not redraw them.
+@metrics.timed("db.fingerprints")
+def fingerprints(conn, start, end, fmt):
+    goals = dict(conn.execute(GOAL_STATE_SQL))
+    logs = {row[0]: row[1:] for row in conn.execute(LOG_STATE_SQL, (start.toordinal(), end.toordinal()))}
+    result = {}
+    for (username,) in conn.execute(USERS_SQL):
+        state = (RENDER_VERSION, fmt, goals.get(username), logs.get(username))
+        result[username] = hashlib.sha1(repr(state).encode()).hexdigest()
+    return result
+
+
+# Directory for a user's charts, relative to the report directory
+def user_dir(username):
+    return os.path.join("users", urllib.parse.quote(username, safe=""))
+
+
+# Worker state: each process keeps its own read-only connection and chart
+# renderer (and so its own Agg figures) for every user it is given.
+_worker = None
+
+
+def _init_worker(db_path, out_dir, start, end, fmt):
+    global _worker
+    conn = sqlite3.connect("file:{}?mode=ro".format(urllib.parse.quote(os.path.abspath(db_path))), uri=True)
+    _worker = (conn, out_dir, start, end, fmt)
+
+
+# Workers exit without running atexit, so each result carries its render time
+# for the parent to record
+def _render_user(job):
+    username, fingerprint = job
+    started = time.perf_counter()
+    try:
+        result = _render(username, fingerprint)
+    except Exception as e:
+        result = {"username": username, "error": "{}: {}".format(type(e).__name__, e)}
+    result["millis"] = (time.perf_counter() - started) * 1000
+    return result
+
+
+# Render one user's goal pie charts and calorie chart into their directory
+def _render(username, fingerprint):
+    from Fitness import Goal, Visualization, plot_calorie_graph
+    import daily_log
+    conn, out_dir, start, end, fmt = _worker
+    directory = user_dir(username)
+    os.makedirs(os.path.join(out_dir, directory), exist_ok=True)
+
+    files = []
+    complete = 0
+    goals = conn.execute(USER_GOALS_SQL, (username,)).fetchall()
+    for goal_id, description, target, deadline, progress in goals:
+        goal = Goal(description, target, deadline and datetime.date.fromisoformat(deadline), username)
+        goal.id = goal_id
+        goal.progress = progress or 0
+        complete += goal.is_complete()
+        if target <= 0:
+            continue
+        # A finished goal is drawn as a full pie
+        goal.progress = max(min(goal.progress, target), 0)
+        name = os.path.join(directory, "goal-{}.{}".format(goal_id, fmt))
+        Visualization.generate_pie_chart(goal, os.path.join(out_dir, name))
+        files.append(name)
+
+    series = daily_log.query_range(conn, username, start, end)
+    if len(series.days):
+        name = os.path.join(directory, "calories.{}".format(fmt))
+        dates = [datetime.date.fromordinal(day).isoformat() for day in series.days.tolist()]
+        plot_calorie_graph(list(zip(dates, series.intake.tolist(), series.expenditure.tolist())),
+                           os.path.join(out_dir, name), summary=(conn, username, start, end))
+        files.append(name)
+
+    return {
+        "username": username,
+        "fingerprint": fingerprint,
+        "files": files,
+        "goals": len(goals),
+        "complete": complete,
+        "days": len(series.days),
+        "intake": float(series.intake.sum()),
+        "expenditure": float(series.expenditure.sum()),
+    }
+
+
+def read_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST), encoding="utf-8") as stream:
+            return json.load(stream)
+    except (OSError, ValueError):
+        return {}
+
+
+# Replace the manifest atomically, so an interrupted run leaves a valid one
+def write_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST)
+    with open(path + ".tmp", "w", encoding="utf-8") as stream:
+        json.dump(manifest, stream)
+    os.replace(path + ".tmp", path)
+
+
+# Delete charts a user had last time but no longer has (e.g. removed goals)
+def remove_stale(out_dir, old, new):
+    for name in set(old.get("files", ())) - set(new["files"]):
+        try:
+            os.remove(os.path.join(out_dir, name))
+        except FileNotFoundError:
+            pass
+
+
+def write_index(out_dir, manifest, start, end):
+    rows = []
+    for username in sorted(manifest):
+        entry = manifest[username]
+        images = "".join('<a href="{0}"><img src="{0}" height="120"></a>'.format(html.escape(name.replace(os.sep, "/")))
+                         for name in entry["files"])
+        rows.append("<tr><td>{}</td><td>{}/{}</td><td>{}</td><td>{:,.0f}</td><td>{:,.0f}</td><td>{}</td></tr>".format(
+            html.escape(username), entry["complete"], entry["goals"], entry["days"], entry["intake"],
+            entry["intake"] - entry["expenditure"], images))
+    page = '''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Fitness Tracker report</title>
+<style>body {{ font-family: sans-serif; }} td {{ padding: 4px 8px; vertical-align: top; }}</style></head>
+<body><h1>Fitness Tracker report</h1>
+<p>{} users. Calorie data from {} to {}. Generated {}.</p>
+<table><tr><th>User</th><th>Goals complete</th><th>Days logged</th><th>Intake</th><th>Balance</th><th>Charts</th></tr>
+{}
+</table></body></html>
+'''.format(len(manifest), start, end, datetime.datetime.now().strftime("%Y-%m-%d %H:%M"), "\n".join(rows))
+    with open(os.path.join(out_dir, INDEX), "w", encoding="utf-8") as stream:
+        stream.write(page)
+
+
+# Render every user's charts with a pool of `workers` processes.
+# Users whose data is unchanged since the last run are skipped; results are
+# written to the manifest as they arrive. Returns (rendered, skipped, failed).
+def generate(db_path, out_dir, workers=None, days=90, end=None, fmt="png", full=False):
+    import repository
+    end = end or datetime.date.today()
+    start = end - datetime.timedelta(days=days - 1)
+    os.makedirs(out_dir, exist_ok=True)
+
+    conn = sqlite3.connect(db_path)
+    repository.create_schema(conn)
+    current = fingerprints(conn, start, end, fmt)
+    conn.close()
+
+    previous = {} if full else read_manifest(out_dir)
+    manifest = {username: entry for username, entry in previous.items()
+                if current.get(username) == entry.get("fingerprint")}
+    jobs = [(username, fingerprint) for username, fingerprint in current.items() if username not in manifest]
+    skipped = len(manifest)
+    for username in set(previous) - set(current):
+        remove_stale(out_dir, previous[username], {"files": []})
+    rendered = failed = 0
+
+    if jobs:
+        workers = workers or os.cpu_count() or 1
+        last_write = time.monotonic()
+        with multiprocessing.Pool(workers, _init_worker, (db_path, out_dir, start, end, fmt)) as pool:
+            for result in pool.imap_unordered(_render_user, jobs, chunksize=max(1, min(16, len(jobs) // (workers * 8)))):
+                username = result["username"]
+                metrics.observe("report.render_user", result.pop("millis"))
+                if "error" in result:
+                    failed += 1
+                    print("{}: {}".format(username, result["error"]))
+                    continue
+                remove_stale(out_dir, previous.get(username, {}), result)
+                manifest[username] = result
+                rendered += 1
+                if time.monotonic() - last_write >= 1:
+                    write_manifest(out_dir, manifest)
+                    last_write = time.monotonic()
+
+    write_manifest(out_dir, manifest)
+    write_index(out_dir, manifest, start, end)
+    return rendered, skipped, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render every user's progress charts and an HTML summary")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    parser.add_argument("--out", default="reports", help="output directory")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--days", type=int, default=90, help="days of calorie data per chart")
+    parser.add_argument("--end", type=datetime.date.fromisoformat, help="last day of calorie data (default: today)")
+    parser.add_argument("--format", default="png", help="image format, e.g. png or svg")
+    parser.add_argument("--full", action="store_true", help="redraw every user, even if unchanged")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    rendered, skipped, failed = generate(args.db, args.out, args.workers, args.days, args.end, args.format, args.full)
+    print("Rendered {} users, skipped {} unchanged, {} failed in {:.1f} s. Summary: {}".format(
+        rendered, skipped, failed, time.perf_counter() - started, os.path.join(args.out, INDEX)))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
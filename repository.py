@@ -0,0 +1,256 @@
+import concurrent.futures
+import datetime
+import queue
+import sqlite3
+import threading
+
+import collections
+
+import auth
+import calorie_aggregates
+import daily_log
+import metrics
+import progress_events
+
+# Create goals table with ISO 8601 date format
+GOALS_SQL = '''CREATE TABLE IF NOT EXISTS goals (
+                id INTEGER PRIMARY KEY,
+                description TEXT,
+                target INTEGER,
+                deadline TEXT,
+                progress INTEGER,
+                username TEXT
+                )'''
+
+# Completion ratio of a goal; the expression index below must use the same text
+RATIO_SQL = "(CAST(progress AS REAL) / target)"
+
+# Per-user indexes for the goal listing queries. The deadline index also
+# carries progress and target so active/overdue filters never touch the table.
+INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS goals_user_deadline ON goals (username, deadline, progress, target)",
+    "CREATE INDEX IF NOT EXISTS goals_user_ratio ON goals (username, {})".format(RATIO_SQL),
+)
+INDEX_NAMES = ("goals_user_deadline", "goals_user_ratio")
+
+# Statements are kept as module constants so every connection's statement
+# cache sees the same SQL text and reuses the prepared statement.
+INSERT_GOAL_SQL = "INSERT INTO goals (description, target, deadline, progress, username) VALUES (?, ?, ?, ?, ?)"
+GET_GOAL_SQL = "SELECT id, description, target, deadline, progress, username FROM goals WHERE id = ?"
+USER_GOALS_SQL = "SELECT id, description, target, deadline, progress, username FROM goals WHERE username = ? ORDER BY id"
+ACTIVE_GOALS_SQL = ("SELECT id, description, target, deadline, progress, username FROM goals"
+                    " WHERE username = ? AND deadline >= ? AND progress < target ORDER BY deadline")
+OVERDUE_GOALS_SQL = ("SELECT id, description, target, deadline, progress, username FROM goals"
+                     " WHERE username = ? AND deadline < ? AND progress < target ORDER BY deadline")
+NEAR_COMPLETE_SQL = ("SELECT id, description, target, deadline, progress, username FROM goals"
+                     " WHERE username = ? AND {0} >= ? ORDER BY {0} DESC".format(RATIO_SQL))
+
+# Listing queries that must be answered from an index, with sample parameters
+INDEXED_QUERIES = {
+    "for_user": (USER_GOALS_SQL, ("user",)),
+    "active": (ACTIVE_GOALS_SQL, ("user", "2000-01-01")),
+    "overdue": (OVERDUE_GOALS_SQL, ("user", "2000-01-01")),
+    "near_complete": (NEAR_COMPLETE_SQL, ("user", 0.8)),
+}
+
+STATEMENT_CACHE = 256
+MAX_WRITE_BATCH = 256
+
+# Lightweight goal record returned by the listing queries
+GoalRecord = collections.namedtuple("GoalRecord", ["id", "description", "target", "deadline", "progress", "username"])
+
+
+# Create every table the tracker uses
+def create_schema(conn):
+    auth.create_table(conn)
+    conn.execute(GOALS_SQL)
+    create_goal_indexes(conn)
+    daily_log.create_table(conn)
+    calorie_aggregates.create_tables(conn)
+    progress_events.create_tables(conn)
+    conn.commit()
+
+
+def create_goal_indexes(conn):
+    for sql in INDEX_SQL:
+        conn.execute(sql)
+
+
+# Bulk loads drop the goal indexes and rebuild them once at the end, which is
+# much cheaper than updating them row by row
+def drop_goal_indexes(conn):
+    for name in INDEX_NAMES:
+        conn.execute("DROP INDEX IF EXISTS {}".format(name))
+
+
+# Return the names of INDEXED_QUERIES whose query plan scans the goals table
+# without an index (an empty list means every listing query is indexed)
+def unindexed_queries(conn):
+    failures = []
+    for name, (sql, params) in INDEXED_QUERIES.items():
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        if any(step.startswith("SCAN") and "INDEX" not in step for step in plan):
+            failures.append(name)
+    return failures
+
+
+# Thread-safe access to the tracker database.
+# Each thread that reads gets its own read-only connection; all writes go
+# through a queue to one writer thread, which commits whatever has queued up
+# in a single transaction (each job in its own savepoint). The database runs
+# in WAL mode so readers never wait for the writer.
+class Database:
+    def __init__(self, path, max_write_batch=MAX_WRITE_BATCH):
+        self.path = path
+        self.max_write_batch = max_write_batch
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        self._writes = queue.Queue()
+
+        # Set up the schema and WAL before any reader connects
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        create_schema(conn)
+        conn.close()
+
+        self._writer = threading.Thread(target=self._write_loop, name="db-writer", daemon=True)
+        self._writer.start()
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect("file:{}?mode=ro".format(self.path), uri=True,
+                                   check_same_thread=False, cached_statements=STATEMENT_CACHE)
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    @metrics.timed("db.read")
+    def read(self, sql, params=()):
+        return self._reader().execute(sql, params).fetchall()
+
+    @metrics.timed("db.read")
+    def read_one(self, sql, params=()):
+        return self._reader().execute(sql, params).fetchone()
+
+    # Queue func(conn) for the writer thread; returns a Future with its result
+    def write(self, func, *args):
+        future = concurrent.futures.Future()
+        self._writes.put((func, args, future))
+        return future
+
+    def execute(self, sql, params=()):
+        return self.write(_execute, sql, params)
+
+    def _write_loop(self):
+        conn = sqlite3.connect(self.path, isolation_level=None, cached_statements=STATEMENT_CACHE)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        while True:
+            job = self._writes.get()
+            if job is None:
+                break
+            batch = [job]
+            while len(batch) < self.max_write_batch:
+                try:
+                    job = self._writes.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    self._writes.put(None)
+                    break
+                batch.append(job)
+            self._run_batch(conn, batch)
+        conn.close()
+
+    @metrics.timed("db.write_batch")
+    def _run_batch(self, conn, batch):
+        metrics.count("db.writes", len(batch))
+        results = []
+        conn.execute("BEGIN")
+        for func, args, future in batch:
+            conn.execute("SAVEPOINT job")
+            try:
+                result = func(conn, *args)
+            except Exception as e:
+                conn.execute("ROLLBACK TO job")
+                results.append((future, None, e))
+            else:
+                results.append((future, result, None))
+            conn.execute("RELEASE job")
+        try:
+            with metrics.timer("db.commit"):
+                conn.execute("COMMIT")
+        except Exception as e:
+            conn.execute("ROLLBACK")
+            results = [(future, None, e) for future, _, _ in results]
+
+        # Only report results once they are durable
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    # Wait for queued writes, stop the writer and close every connection
+    def close(self):
+        self._writes.put(None)
+        self._writer.join()
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+
+
+def _execute(conn, sql, params):
+    return conn.execute(sql, params).lastrowid
+
+
+# Progress changes go through the event log, which keeps goals.progress as its snapshot
+def _set_progress(conn, goal_id, progress):
+    current = progress_events.current_progress(conn, goal_id)
+    if current is None:
+        return None
+    return progress_events.add_progress(conn, goal_id, progress - current)
+
+
+# Goal rows as returned by GoalRepository: (id, description, target, deadline, progress, username)
+class GoalRepository:
+    def __init__(self, db):
+        self.db = db
+
+    # Returns a Future with the new goal's id
+    def add(self, description, target, deadline, username, progress=0):
+        if isinstance(deadline, datetime.date):
+            deadline = deadline.isoformat()
+        return self.db.execute(INSERT_GOAL_SQL, (description, target, deadline, progress, username))
+
+    # Set a goal's progress, recorded as the change from its current value
+    def update_progress(self, goal_id, progress):
+        return self.db.write(_set_progress, goal_id, progress)
+
+    # Add to a goal's progress atomically; the Future holds the new total (None if no such goal)
+    def add_progress(self, goal_id, amount):
+        return self.db.write(progress_events.add_progress, goal_id, amount)
+
+    def get(self, goal_id):
+        return self.db.read_one(GET_GOAL_SQL, (goal_id,))
+
+    def for_user(self, username):
+        return self._records(USER_GOALS_SQL, (username,))
+
+    # Goals still in progress whose deadline has not passed
+    def active(self, username, today=None):
+        return self._records(ACTIVE_GOALS_SQL, (username, (today or datetime.date.today()).isoformat()))
+
+    # Unfinished goals whose deadline has passed
+    def overdue(self, username, today=None):
+        return self._records(OVERDUE_GOALS_SQL, (username, (today or datetime.date.today()).isoformat()))
+
+    # Goals with progress / target of at least `ratio`, closest to done first
+    def near_complete(self, username, ratio):
+        return self._records(NEAR_COMPLETE_SQL, (username, ratio))
+
+    def _records(self, sql, params):
+        return list(map(GoalRecord._make, self.db.read(sql, params)))
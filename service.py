@@ -0,0 +1,333 @@
+import argparse
+import asyncio
+import concurrent.futures
+import datetime
+import json
+import math
+import sqlite3
+import time
+import urllib.parse
+
+import auth
+import body_metrics
+import diet_catalog
+import meal_planner
+from metrics import LatencyHistogram
+from Fitness import DB_PATH, Goal
+from repository import Database, GoalRepository
+
+MAX_BODY = 1 << 20
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+# Raised by handlers to send an error response
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def goal_to_json(row):
+    goal_id, description, target, deadline, progress, username = row
+    goal = Goal(description, target, datetime.date.fromisoformat(deadline), username)
+    goal.id = goal_id
+    goal.progress = progress
+    return {
+        "id": goal_id,
+        "description": description,
+        "target": target,
+        "deadline": deadline,
+        "progress": progress,
+        "username": username,
+        "complete": goal.is_complete(),
+        "days_remaining": goal.days_remaining(),
+    }
+
+
+def meal_to_json(meal):
+    return {"slot": meal.slot, "description": meal.description, "calories": meal.calories}
+
+
+# The token from an "Authorization: Bearer <token>" header, or None
+def bearer_token(headers):
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    return token.strip() or None
+
+
+def require(body, *names):
+    try:
+        return [body[name] for name in names]
+    except (KeyError, TypeError):
+        raise HTTPError(400, "required fields: {}".format(", ".join(names)))
+
+
+# JSON API over the goal repository, BMI metrics and diet plans.
+# Database calls run in a bounded thread pool; concurrent reads of the same
+# goal share a single in-flight lookup. Routes marked as authenticated need an
+# "Authorization: Bearer <token>" header from POST /login; their handlers get
+# the token after the request body and may only touch the token user's goals.
+class FitnessService:
+    def __init__(self, db_path=DB_PATH, workers=8):
+        self.db = Database(db_path)
+        self.goals = GoalRepository(self.db)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db-read")
+        self.planner = meal_planner.MealPlanner()
+        self.credentials = auth.CredentialStore(self.db)
+        self.inflight = {}
+        self.latency = {}
+        self.routes = [
+            ("GET", ("goals",), self.list_goals, True),
+            ("POST", ("goals",), self.create_goal, True),
+            ("GET", ("goals", None), self.get_goal, True),
+            ("POST", ("goals", None, "progress"), self.add_progress, True),
+            ("POST", ("users",), self.register, False),
+            ("POST", ("login",), self.login, False),
+            ("POST", ("logout",), self.logout, True),
+            ("POST", ("bmi",), self.bmi, False),
+            ("GET", ("plans", None), self.plan, False),
+            ("GET", ("metrics",), self.metrics, False),
+        ]
+
+    async def _read(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def _fetch_goal(self, goal_id):
+        task = self.inflight.get(goal_id)
+        if task is None:
+            task = asyncio.ensure_future(self._read(self.goals.get, goal_id))
+            self.inflight[goal_id] = task
+            task.add_done_callback(lambda _: self.inflight.pop(goal_id, None))
+        return await asyncio.shield(task)
+
+    # The username a session token belongs to
+    def _user(self, token):
+        username = token and self.credentials.authenticate(token)
+        if username is None:
+            raise HTTPError(401, "a valid bearer token is required")
+        return username
+
+    # A goal row owned by the token's user
+    async def _own_goal(self, token, goal_id):
+        username = self._user(token)
+        row = await self._fetch_goal(int(goal_id))
+        if row is None:
+            raise HTTPError(404, "no such goal")
+        if row[5] != username:
+            raise HTTPError(403, "goal belongs to another user")
+        return row
+
+    async def list_goals(self, query, body, token):
+        username = self._user(token)
+        if query.get("username", username) != username:
+            raise HTTPError(403, "cannot list another user's goals")
+        status = query.get("status")
+        if status == "active":
+            rows = await self._read(self.goals.active, username)
+        elif status == "overdue":
+            rows = await self._read(self.goals.overdue, username)
+        elif "min_ratio" in query:
+            rows = await self._read(self.goals.near_complete, username, float(query["min_ratio"]))
+        elif status is None:
+            rows = await self._read(self.goals.for_user, username)
+        else:
+            raise HTTPError(400, "status must be active or overdue")
+        return 200, [goal_to_json(row) for row in rows]
+
+    async def create_goal(self, query, body, token):
+        username = self._user(token)
+        description, target, deadline = require(body, "description", "target", "deadline")
+        if not isinstance(description, str) or not description.strip():
+            raise HTTPError(400, "description must be a non-empty string")
+        if body.get("username", username) != username:
+            raise HTTPError(403, "cannot create goals for another user")
+        try:
+            target = int(target)
+            deadline = datetime.date.fromisoformat(deadline)
+        except (TypeError, ValueError):
+            raise HTTPError(400, "target must be an integer and deadline YYYY-MM-DD")
+        goal_id = await asyncio.wrap_future(self.goals.add(description, target, deadline, username))
+        return 201, {"id": goal_id}
+
+    async def get_goal(self, query, body, token, goal_id):
+        return 200, goal_to_json(await self._own_goal(token, goal_id))
+
+    async def add_progress(self, query, body, token, goal_id):
+        amount, = require(body, "amount")
+        try:
+            amount = int(amount)
+        except (TypeError, ValueError):
+            raise HTTPError(400, "amount must be an integer")
+        await self._own_goal(token, goal_id)
+        progress = await asyncio.wrap_future(self.goals.add_progress(int(goal_id), amount))
+        if progress is None:
+            raise HTTPError(404, "no such goal")
+        return 200, {"id": int(goal_id), "progress": progress}
+
+    async def register(self, query, body):
+        username, password = require(body, "username", "password")
+        try:
+            await asyncio.wrap_future(self.credentials.register(str(username), str(password)))
+        except sqlite3.IntegrityError:
+            raise HTTPError(409, "username already taken")
+        return 201, {"username": username}
+
+    async def login(self, query, body):
+        username, password = require(body, "username", "password")
+        token = await asyncio.wrap_future(self.credentials.login(str(username), str(password)))
+        if token is None:
+            raise HTTPError(401, "invalid username or password")
+        return 200, {"token": token}
+
+    async def logout(self, query, body, token):
+        self._user(token)
+        self.credentials.logout(token)
+        return 200, {}
+
+    async def bmi(self, query, body):
+        weight, height_cm, age = require(body, "weight", "height_cm", "age")
+        try:
+            weight, height_cm, age = float(weight), float(height_cm), int(age)
+            if not (0 < weight < math.inf and 0 < height_cm < math.inf and age > 0):
+                raise ValueError
+            bmi = body_metrics.compute_bmi(weight, height_cm)
+        except (TypeError, ValueError, OverflowError):
+            raise HTTPError(400, "weight, height_cm and age must be positive numbers")
+        return 200, {
+            "bmi": round(bmi, 2),
+            "category": body_metrics.bmi_category(bmi),
+            "bmr": round(body_metrics.basal_metabolic_rate(weight, height_cm, age)),
+            "tdee": round(body_metrics.total_daily_energy(weight, height_cm, age)),
+        }
+
+    async def plan(self, query, body, goal):
+        catalog = diet_catalog.load_catalog()
+        if goal not in catalog.titles:
+            raise HTTPError(404, "unknown diet goal")
+        if "weight" in query:
+            try:
+                target = meal_planner.calorie_target(float(query["weight"]), float(query["height_cm"]),
+                                                     int(query["age"]), goal)
+            except (KeyError, ValueError):
+                raise HTTPError(400, "weight, height_cm and age are required together")
+            week = self.planner.plan_week(target)
+            days = [{"day": number, "meals": [meal_to_json(meal) for meal in meals]}
+                    for number, meals in enumerate(week.days, start=1)]
+            return 200, {"goal": goal, "target": target, "within_tolerance": week.within_tolerance, "days": days}
+
+        days = sorted(day for plan_goal, day in catalog.days if plan_goal == goal)
+        return 200, {"goal": goal, "title": catalog.titles[goal], "days": [
+            {"day": day, "meals": [meal_to_json(meal) for meal in catalog.day_plan(goal, day)]} for day in days]}
+
+    async def metrics(self, query, body):
+        return 200, {route: histogram.summary() for route, histogram in self.latency.items()}
+
+    def _route(self, method, path):
+        parts = tuple(part for part in path.split("/") if part)
+        allowed = False
+        for route_method, pattern, handler, authenticated in self.routes:
+            if len(pattern) != len(parts):
+                continue
+            if all(expected is None or expected == part for expected, part in zip(pattern, parts)):
+                args = [part for expected, part in zip(pattern, parts) if expected is None]
+                if route_method == method:
+                    return ("{} /{}".format(method, "/".join(part or "{}" for part in pattern)), handler, args,
+                            authenticated)
+                allowed = True
+        raise HTTPError(405 if allowed else 404, "method not allowed" if allowed else "not found")
+
+    async def dispatch(self, method, target, body, headers=None):
+        url = urllib.parse.urlsplit(target)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        start = time.perf_counter()
+        route = "unmatched"
+        try:
+            route, handler, args, authenticated = self._route(method, url.path)
+            if authenticated:
+                args.insert(0, bearer_token(headers or {}))
+            payload = json.loads(body) if body else {}
+            status, result = await handler(query, payload, *args)
+        except HTTPError as e:
+            status, result = e.status, {"error": e.message}
+        except ValueError:
+            status, result = 400, {"error": "invalid request"}
+        except Exception as e:
+            status, result = 500, {"error": str(e)}
+        self.latency.setdefault(route, LatencyHistogram()).observe((time.perf_counter() - start) * 1000)
+        return status, result
+
+    # Serve HTTP/1.1 requests (with keep-alive) on one client connection
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY:
+                    status, result = 413, {"error": "request body too large"}
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, result = await self.dispatch(method, target, body, headers)
+
+                data = json.dumps(result).encode()
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                writer.write("HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n"
+                             "Connection: {}\r\n\r\n".format(status, REASONS.get(status, ""), len(data),
+                                                             "keep-alive" if keep_alive else "close").encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8080):
+        return await asyncio.start_server(self.handle_client, host, port)
+
+    def close(self):
+        self.executor.shutdown()
+        self.credentials.close()
+        self.db.close()
+
+
+async def serve(host, port, db_path, workers):
+    service = FitnessService(db_path, workers)
+    server = await service.start(host, port)
+    print("Fitness Tracker API listening on http://{}:{}".format(host, port))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fitness Tracker HTTP/JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    parser.add_argument("--workers", type=int, default=8, help="database worker threads")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.db, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
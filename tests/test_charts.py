@@ -0,0 +1,82 @@
+# Calorie chart level of detail: summary-table bins against rebinned daily rows
+# Run from the repository root: python -m pytest tests
+import datetime
+import sqlite3
+
+import numpy as np
+import pytest
+
+import charts
+import daily_log
+import repository
+
+USER = "user"
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "fitness.db"))
+    repository.create_schema(conn)
+    yield conn
+    conn.close()
+
+
+# Log every day from start for the given number of days, with gaps every fifth day
+def log_days(conn, start, count):
+    rng = np.random.default_rng(count)
+    rows = [((start + datetime.timedelta(days=offset)).isoformat(), float(intake), float(expenditure))
+            for offset, intake, expenditure in zip(range(count), rng.integers(1500, 3200, count),
+                                                   rng.integers(1400, 3000, count))
+            if offset % 5]
+    daily_log.upsert_days(conn, USER, rows)
+
+
+def bins(conn, start, end):
+    series = daily_log.query_range(conn, USER, start, end)
+    days = daily_log.as_dates(series.days)
+    return (charts.calorie_bins(days, series.intake, series.expenditure),
+            charts.calorie_bins(days, series.intake, series.expenditure, (conn, USER, start, end)))
+
+
+def assert_same_bins(raw, summary):
+    assert raw[0] == summary[0]
+    assert raw[1].tolist() == summary[1].tolist()
+    np.testing.assert_allclose(raw[2], summary[2])
+    np.testing.assert_allclose(raw[3], summary[3])
+
+
+# 2024-01-01 is a Monday; 364 days are 52 whole weeks
+def test_weekly_bins_match(conn):
+    start = datetime.date(2024, 1, 1)
+    end = start + datetime.timedelta(days=363)
+    log_days(conn, start, 364)
+    raw, summary = bins(conn, start, end)
+    assert raw[0] == "week"
+    assert_same_bins(raw, summary)
+
+
+def test_monthly_bins_match(conn):
+    start, end = datetime.date(2020, 1, 1), datetime.date(2023, 12, 31)
+    log_days(conn, start, (end - start).days + 1)
+    raw, summary = bins(conn, start, end)
+    assert raw[0] == "month"
+    assert_same_bins(raw, summary)
+
+
+def test_short_ranges_keep_daily_bars(conn):
+    start = datetime.date(2024, 1, 1)
+    log_days(conn, start, 30)
+    raw, summary = bins(conn, start, start + datetime.timedelta(days=29))
+    assert raw[0] is summary[0] is None
+    assert_same_bins(raw, summary)
+
+
+def test_rendering_from_summaries(conn, tmp_path):
+    start, end = datetime.date(2020, 1, 1), datetime.date(2023, 12, 31)
+    log_days(conn, start, (end - start).days + 1)
+    series = daily_log.query_range(conn, USER, start, end)
+    renderer = charts.ChartRenderer()
+    image = renderer.calorie_chart(daily_log.as_dates(series.days), series.intake, series.expenditure,
+                                   summary=(conn, USER, start, end))
+    assert image.startswith(b"\x89PNG")
+    assert renderer.calorie_chart([], [], [], summary=(conn, USER, start, end)).startswith(b"\x89PNG")
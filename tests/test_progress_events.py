@@ -0,0 +1,185 @@
+# Progress event log: compaction on every write path, and the history queries
+# Run from the repository root: python -m pytest tests
+import asyncio
+import datetime
+import json
+import sqlite3
+
+import pytest
+
+import cli
+import progress_events
+import repository
+from progress_journal import ProgressJournal
+from service import FitnessService
+
+DAY = datetime.date(2030, 1, 10)
+
+
+def day_ts(date):
+    return (date.toordinal() - progress_events.EPOCH_ORDINAL) * progress_events.SECONDS_PER_DAY
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "fitness.db"))
+    repository.create_schema(conn)
+    yield conn
+    conn.close()
+
+
+def add_goal(conn, target=100, progress=0, deadline="2030-02-01"):
+    with conn:
+        return conn.execute(repository.INSERT_GOAL_SQL, ("Run", target, deadline, progress, "user")).lastrowid
+
+
+def stored_progress(conn, goal_id):
+    return conn.execute("SELECT progress FROM goals WHERE id = ?", (goal_id,)).fetchone()[0]
+
+
+def max_event_id(conn):
+    return conn.execute("SELECT coalesce(max(id), 0) FROM progress_events").fetchone()[0]
+
+
+# goals.progress is the snapshot: it matches current_progress and the
+# watermark covers every event
+def assert_compacted(conn, goal_id, expected):
+    assert stored_progress(conn, goal_id) == expected
+    assert progress_events.current_progress(conn, goal_id) == expected
+    assert progress_events.compacted_id(conn) == max_event_id(conn)
+
+
+def test_add_progress_compacts_and_rejects_unknown_goals(conn):
+    goal_id = add_goal(conn, progress=5)
+    with conn:
+        assert progress_events.add_progress(conn, goal_id, 7) == 12
+        assert progress_events.add_progress(conn, goal_id + 1, 7) is None
+    assert_compacted(conn, goal_id, 12)
+
+
+def test_log_events_stay_pending_until_compacted(conn):
+    goal_id = add_goal(conn, progress=5)
+    log = progress_events.ProgressEventLog(conn)
+    log.record(goal_id, 3)
+    log.record(goal_id, 4)
+    log.flush()
+    assert stored_progress(conn, goal_id) == 5
+    assert progress_events.current_progress(conn, goal_id) == 12
+    assert log.compact() == 2
+    assert_compacted(conn, goal_id, 12)
+    assert log.compact() == 0
+
+
+# The journal merges updates per goal and folds in events other writers left pending
+def test_journal_flush_compacts(conn):
+    first, second = add_goal(conn, progress=50), add_goal(conn)
+    log = progress_events.ProgressEventLog(conn)
+    log.record(first, 7)
+    log.flush()
+
+    journal = ProgressJournal(conn, max_events=10 ** 6, max_delay_ms=10 ** 9)
+    for amount in (3, -1, 2):
+        journal.record(first, amount)
+    journal.record(second, 4)
+    assert stored_progress(conn, first) == 50
+    assert journal.flush() == 2
+    assert_compacted(conn, first, 61)
+    assert_compacted(conn, second, 4)
+    assert journal.flush() == 0
+
+
+def test_repository_progress_goes_through_the_log(tmp_path):
+    db = repository.Database(str(tmp_path / "fitness.db"))
+    try:
+        goals = repository.GoalRepository(db)
+        goal_id = goals.add("Run", 100, "2030-02-01", "user", progress=10).result()
+        assert goals.add_progress(goal_id, 5).result() == 15
+        assert goals.update_progress(goal_id, 40).result() == 40
+        assert goals.add_progress(goal_id + 1, 5).result() is None
+    finally:
+        db.close()
+    conn = sqlite3.connect(str(tmp_path / "fitness.db"))
+    assert [amount for (amount,) in conn.execute("SELECT amount FROM progress_events ORDER BY id")] == [5, 25]
+    assert_compacted(conn, goal_id, 40)
+    conn.close()
+
+
+def test_service_progress_is_compacted(tmp_path):
+    async def run(service):
+        async def request(method, target, body=None, token=None):
+            headers = {"authorization": "Bearer " + token} if token else {}
+            return await service.dispatch(method, target, json.dumps(body).encode() if body else b"", headers)
+
+        await request("POST", "/users", {"username": "user", "password": "secret"})
+        _, result = await request("POST", "/login", {"username": "user", "password": "secret"})
+        token = result["token"]
+        _, result = await request("POST", "/goals", {"description": "Run", "target": 100, "deadline": "2030-02-01"},
+                                  token)
+        assert await request("POST", "/goals/{}/progress".format(result["id"]), {"amount": 30}, token) == (
+            200, {"id": result["id"], "progress": 30})
+        return result["id"]
+
+    service = FitnessService(str(tmp_path / "fitness.db"))
+    try:
+        goal_id = asyncio.run(run(service))
+    finally:
+        service.close()
+    conn = sqlite3.connect(str(tmp_path / "fitness.db"))
+    assert_compacted(conn, goal_id, 30)
+    conn.close()
+
+
+def test_cli_progress_is_compacted_and_atomic(tmp_path):
+    session = cli.BatchSession(str(tmp_path / "fitness.db"))
+    try:
+        goal_id = add_goal(session.conn, progress=20)
+        assert session.run("goals progress", [{"id": goal_id, "amount": 5}, {"id": goal_id, "amount": 1}]) == [
+            {"id": goal_id, "progress": 25}, {"id": goal_id, "progress": 26}]
+        with pytest.raises(cli.CommandError):
+            session.run("goals progress", [{"id": goal_id, "amount": 5}, {"id": goal_id + 1, "amount": 1}])
+        assert_compacted(session.conn, goal_id, 26)
+    finally:
+        session.close()
+
+
+# A goal created with progress 50 of 100 and one event of 10 has 40 left
+def test_burndown_counts_initial_progress(conn):
+    goal_id = add_goal(conn, progress=50)
+    with conn:
+        progress_events.add_progress(conn, goal_id, 10, ts=day_ts(DAY))
+    assert progress_events.initial_progress(conn, goal_id) == 50
+    days, remaining = progress_events.burndown(conn, goal_id)
+    assert days.tolist() == [DAY.toordinal()]
+    assert remaining.tolist() == [40]
+
+
+def test_burndown_with_pending_events(conn):
+    goal_id = add_goal(conn, progress=50)
+    log = progress_events.ProgressEventLog(conn)
+    log.record(goal_id, 10, ts=day_ts(DAY))
+    log.record(goal_id, 5, ts=day_ts(DAY + datetime.timedelta(days=2)))
+    log.flush()
+    days, remaining = progress_events.burndown(conn, goal_id)
+    assert len(days) == 3
+    assert remaining.tolist() == [40, 40, 35]
+    log.compact()
+    assert progress_events.burndown(conn, goal_id)[1].tolist() == [40, 40, 35]
+
+
+# 5 a day over the last 10 days leaves 50 to go: 10 more days
+def test_projected_completion(conn):
+    goal_id = add_goal(conn, progress=0, deadline="2030-02-01")
+    with conn:
+        for offset in range(10):
+            progress_events.add_progress(conn, goal_id, 5, ts=day_ts(DAY - datetime.timedelta(days=offset)))
+    assert progress_events.projected_completion(conn, goal_id, window=10, today=DAY) == (
+        DAY + datetime.timedelta(days=10), True)
+    assert progress_events.projected_completion(conn, goal_id, window=10, today=DAY + datetime.timedelta(days=30)) == (
+        None, False)
+
+
+def test_projected_completion_counts_initial_progress(conn):
+    goal_id = add_goal(conn, progress=95)
+    with conn:
+        progress_events.add_progress(conn, goal_id, 5, ts=day_ts(DAY))
+    assert progress_events.projected_completion(conn, goal_id, today=DAY) == (DAY, True)